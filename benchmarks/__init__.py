@@ -0,0 +1,3 @@
+"""
+Cafram benchmarks
+"""
@@ -0,0 +1,64 @@
+"""
+Benchmark iterative tree construction
+
+Compare the work stack builder (ITERATIVE_BUILD) against recursive
+constructor calls, on a wide tree and on a deep tree. Deep trees are only
+built recursively when they fit in the recursion limit.
+
+Usage:
+    python -m benchmarks.bench_build [--width 6] [--depth 4] [--list-len 3]
+        [--deep 10000] [--output results.json]
+"""
+
+import sys
+import logging
+import timeit
+
+import cafram.nodes
+from cafram.nodes import NodeAuto
+
+from benchmarks.common import main
+from benchmarks.generators import make_payload, make_deep_payload
+
+
+def build(payload):
+    "Build a whole tree"
+    return NodeAuto(ident="bench", payload=payload, autoconf=-1)
+
+
+def timing(payload, iterative, number=3):
+    "Return best build time"
+    saved = cafram.nodes.ITERATIVE_BUILD
+    try:
+        cafram.nodes.ITERATIVE_BUILD = iterative
+        return min(timeit.repeat(lambda: build(payload), number=number, repeat=3))
+    except RecursionError:
+        return None
+    finally:
+        cafram.nodes.ITERATIVE_BUILD = saved
+
+
+def run(width=6, depth=4, list_len=3, deep=10000):
+    "Run benchmark and return timings"
+
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+    wide = make_payload(width, depth, list_len)
+    deep = make_deep_payload(deep)
+
+    return {
+        "wide_recursive": timing(wide, False),
+        "wide_iterative": timing(wide, True),
+        "deep_recursive": timing(deep, False, number=1),
+        "deep_iterative": timing(deep, True, number=1),
+    }
+
+
+def report(timings):
+    "Print timings"
+    for mode, duration in timings.items():
+        result = "RecursionError" if duration is None else f"{duration:.4f}s"
+        print(f"{mode:<20}{result}")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,107 @@
+"""
+Benchmark NodeDict defaults merging
+
+Compare copy on write defaults against a full deepcopy of conf_default for
+each instance, on a class with a large conf_default instantiated many times.
+
+Usage:
+    python -m benchmarks.bench_defaults [--instances 2000] [--keys 200]
+        [--output results.json]
+"""
+
+import sys
+import copy
+import logging
+import timeit
+import tracemalloc
+
+from cafram.nodes import NodeList, NodeMap
+
+from benchmarks.common import main
+
+
+def make_defaults(keys):
+    "Generate a large conf_default, with some mutable values"
+    result = {}
+    for idx in range(keys):
+        if idx % 10 == 0:
+            result[f"opt_{idx}"] = {"enabled": False, "values": [idx, idx + 1]}
+        elif idx % 10 == 1:
+            result[f"opt_{idx}"] = [f"item_{idx}"]
+        else:
+            result[f"opt_{idx}"] = f"value_{idx}"
+    return result
+
+
+def make_classes(keys):
+    "Return copy on write and deepcopy list classes"
+
+    class Item(NodeMap):
+        "Item with large defaults"
+
+        __slots__ = ()
+        conf_default = make_defaults(keys)
+        conf_children = [{"key": "opt_0"}, {"key": "opt_2"}]
+
+    class ItemDeepcopy(Item):
+        "Item copying the whole defaults, like before copy on write"
+
+        __slots__ = ()
+
+        def _node_conf_defaults(self, payload):
+            result = copy.deepcopy(self.conf_default)
+            result.update(payload or {})
+            return super()._node_conf_defaults(result)
+
+    class Items(NodeList):
+        "Copy on write items"
+
+        __slots__ = ()
+        conf_children = Item
+
+    class ItemsDeepcopy(NodeList):
+        "Deepcopy items"
+
+        __slots__ = ()
+        conf_children = ItemDeepcopy
+
+    return Items, ItemsDeepcopy
+
+
+def measure(cls, payload):
+    "Return build time and retained memory"
+
+    duration = min(
+        timeit.repeat(lambda: cls(ident="bench", payload=payload), number=1, repeat=3)
+    )
+
+    tracemalloc.start()
+    node = cls(ident="bench", payload=payload)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del node
+
+    return duration, memory
+
+
+def run(instances=2000, keys=200):
+    "Run benchmark and return timings and memory"
+
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+    items, items_deepcopy = make_classes(keys)
+    payload = [{"opt_0": {"enabled": True}, "opt_2": "set"} for _ in range(instances)]
+
+    return {
+        "copy_on_write": measure(items, payload),
+        "deepcopy": measure(items_deepcopy, payload),
+    }
+
+
+def report(results):
+    "Print timings and memory"
+    for mode, (duration, memory) in results.items():
+        print(f"{mode:<20}{duration:.4f}s{memory / 1024 / 1024:>10.1f}MB")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,56 @@
+"""
+Benchmark JSON fast mode
+
+Measure JSON helpers throughput on a large payload, with the json module
+and in fast mode, with orjson when installed.
+
+Usage:
+    python -m benchmarks.bench_json [--width 8] [--depth 5] [--list-len 3]
+        [--number 3] [--output results.json]
+"""
+
+import sys
+import json
+import timeit
+
+import cafram.utils
+from cafram.utils import to_json, from_json, to_dict, serialize
+
+from benchmarks.common import main
+from benchmarks.generators import make_payload
+
+
+def run(width=8, depth=5, list_len=3, number=3):
+    "Run benchmark and return MB/s per backend and helper"
+
+    payload = make_payload(width, depth, list_len)
+    string = json.dumps(payload, indent=2)
+    size = len(string) / 1024 / 1024
+
+    helpers = {
+        "to_json": lambda fast: to_json(payload, fast=fast),
+        "from_json": lambda fast: from_json(string, fast=fast),
+        "to_dict": lambda fast: to_dict(payload, fast=fast),
+        "serialize": lambda fast: serialize(payload, fast=fast),
+    }
+
+    results = {"size": size, "orjson": cafram.utils.orjson is not None}
+    for mode, fast in [("json", False), ("fast", True)]:
+        assert to_json(payload, fast=fast) == string
+        for name, func in helpers.items():
+            duration = timeit.timeit(lambda: func(fast), number=number) / number
+            results[f"{name}_{mode}"] = size / duration
+    return results
+
+
+def report(results):
+    "Print throughputs"
+    results = dict(results)
+    print(f"{'size':<20}{results.pop('size'):.2f}MB")
+    print(f"{'orjson':<20}{results.pop('orjson')}")
+    for mode, throughput in results.items():
+        print(f"{mode:<20}{throughput:>8.1f}MB/s")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,69 @@
+"""
+Benchmark tree construction cost of cafram logging
+
+Compare building a large tree with the cafram logger disabled against the
+same build with logging calls replaced by no-ops (logging removed).
+
+Usage:
+    python -m benchmarks.bench_logging [--width 6] [--depth 4] [--list-len 3]
+        [--number 3] [--output results.json]
+"""
+
+import sys
+import logging
+import timeit
+
+from cafram.nodes import NodeAuto
+
+from benchmarks.common import main
+from benchmarks.generators import make_payload
+
+
+def build(payload):
+    "Build a whole tree"
+    return NodeAuto(ident="bench", payload=payload, autoconf=-1)
+
+
+def noop(*args, **kwargs):
+    "Logging replacement"
+    return False
+
+
+def run(width=6, depth=4, list_len=3, number=3):
+    "Run benchmark and return timings"
+
+    payload = make_payload(width, depth, list_len)
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+
+    results = {}
+    results["logging_off"] = min(
+        timeit.repeat(lambda: build(payload), number=number, repeat=3)
+    )
+
+    saved = {
+        name: getattr(logging.LoggerAdapter, name)
+        for name in ("debug", "info", "critical", "isEnabledFor")
+    }
+    try:
+        for name in saved:
+            setattr(logging.LoggerAdapter, name, noop)
+        results["logging_removed"] = min(
+            timeit.repeat(lambda: build(payload), number=number, repeat=3)
+        )
+    finally:
+        for name, fun in saved.items():
+            setattr(logging.LoggerAdapter, name, fun)
+
+    return results
+
+
+def report(timings):
+    "Print timings"
+    for mode, duration in timings.items():
+        print(f"{mode:<20}{duration:.4f}s")
+    ratio = timings["logging_off"] / timings["logging_removed"]
+    print(f"{'overhead':<20}{(ratio - 1) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,83 @@
+"""
+Benchmark memory used per node
+
+Compare bytes per node of compact classes (declaring __slots__) against
+the same classes backed by a regular instance __dict__.
+
+Usage:
+    python -m benchmarks.bench_memory [--items 2000] [--output results.json]
+"""
+
+import sys
+import logging
+import tracemalloc
+
+from cafram.nodes import NodeAuto, NodeList, NodeMap
+
+from benchmarks.common import main
+from benchmarks.generators import make_items
+
+
+class ItemDict(NodeMap):
+    "Dict backed item"
+
+
+class ItemCompact(NodeMap):
+    "Compact item"
+
+    __slots__ = ()
+
+
+class ItemsDict(NodeList):
+    "Dict backed list"
+
+    conf_children = ItemDict
+
+
+class ItemsCompact(NodeList):
+    "Compact list"
+
+    __slots__ = ()
+    conf_children = ItemCompact
+
+
+def count_nodes(node):
+    "Count nodes of a tree"
+    children = node.get_children()
+    if isinstance(children, dict):
+        children = children.values()
+    return 1 + sum(count_nodes(child) for child in children or [])
+
+
+def measure(build):
+    "Return bytes per node allocated by build()"
+    tracemalloc.start()
+    try:
+        node = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size / count_nodes(node)
+
+
+def run(items=2000):
+    "Run benchmark and return bytes per node"
+
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+    payload = make_items(items)
+
+    return {
+        "dict": measure(lambda: ItemsDict(ident="items", payload=payload)),
+        "compact": measure(lambda: ItemsCompact(ident="items", payload=payload)),
+        "auto": measure(lambda: NodeAuto(ident="items", payload=payload)),
+    }
+
+
+def report(results):
+    "Print bytes per node"
+    for mode, size in results.items():
+        print(f"{mode:<20}{size:.0f} bytes/node")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
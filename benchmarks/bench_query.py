@@ -0,0 +1,100 @@
+"""
+Benchmark nodes queries
+
+Compare indexed queries against tree walks, on a tree of about `nodes`
+nodes: a list of files, each with a filters children.
+
+Usage:
+    python -m benchmarks.bench_query [--nodes 1000000] [--output results.json]
+"""
+
+import sys
+import time
+import logging
+
+from cafram.nodes import NodeMap, NodeList
+
+from benchmarks.common import main
+
+
+class Filter(NodeMap):
+    "Filter"
+
+    __slots__ = ()
+
+
+class File(NodeMap):
+    "File"
+
+    __slots__ = ()
+    conf_children = [{"key": "filters", "cls": Filter}]
+
+
+class Files(NodeList):
+    "Files list"
+
+    __slots__ = ()
+    conf_children = File
+
+
+class Config(NodeMap):
+    "Indexed config"
+
+    __slots__ = ()
+    conf_index = True
+    conf_children = [{"key": "files", "cls": Files}]
+
+
+QUERIES = {
+    "class": {"cls": Filter},
+    "name": {"path": "**.filters"},
+    "name_glob": {"path": "**.filt*"},
+    "class_where": {"cls": File, "where": {"name": "file_42"}},
+}
+
+
+def make_payload(nodes):
+    "Generate files, 2 nodes per file"
+    return {
+        "files": [
+            {"name": f"file_{idx}", "filters": {"glob": f"*.{idx % 10}"}}
+            for idx in range(nodes // 2)
+        ]
+    }
+
+
+def timing(func):
+    "Return time of one call and its result"
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(nodes=1000000):
+    "Run benchmark and return timings"
+
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+    payload = make_payload(nodes)
+    results = {}
+    results["build"], node = timing(lambda: Config(ident="bench", payload=payload))
+
+    # pylint: disable=protected-access
+    index = node._node_index
+    for name, query in QUERIES.items():
+        results[f"{name}_indexed"], found = timing(lambda: node.query_nodes(**query))
+        node._node_index = None
+        results[f"{name}_walk"], walked = timing(lambda: node.query_nodes(**query))
+        node._node_index = index
+        assert len(found) == len(walked), f"Results mismatch for {name}"
+
+    return results
+
+
+def report(timings):
+    "Print timings"
+    for mode, duration in timings.items():
+        print(f"{mode:<20}{duration:.4f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,72 @@
+"""
+Benchmark YAML serialization
+
+Compare serialize(fmt="yaml") against the previous implementation, which
+went through json.dumps(), json.loads() and a YAML dump in a string.
+
+Usage:
+    python -m benchmarks.bench_serialize [--width 6] [--depth 4] [--list-len 3]
+        [--number 5] [--output results.json]
+"""
+
+import io
+import sys
+import json
+import timeit
+
+from cafram.utils import serialize, get_yaml
+
+from benchmarks.common import main
+from benchmarks.generators import make_payload, count_nodes
+
+
+def serialize_json_yaml(obj):
+    "Previous serialize(fmt='yaml') implementation"
+
+    # pylint: disable=unnecessary-lambda
+    obj = json.dumps(obj, default=lambda o: str(o), indent=2)
+    obj = json.loads(obj)
+    string_stream = io.StringIO()
+    get_yaml().dump(obj, string_stream)
+    output_str = string_stream.getvalue()
+    string_stream.close()
+    return output_str.split("\n", 2)[2]
+
+
+def run(width=6, depth=4, list_len=3, number=5):
+    "Run benchmark and return results"
+
+    payloads = {
+        "small": {"k1": "val1", "k2": ["val1"], "k3": {"k4": "val1"}},
+        "tree": make_payload(width, depth, list_len),
+    }
+
+    results = {}
+    for name, payload in payloads.items():
+        assert serialize(payload, fmt="yaml") == serialize_json_yaml(payload)
+        count = number * 1000 if name == "small" else number
+        results[name] = {
+            "nodes": count_nodes(payload),
+            "json_yaml": timeit.timeit(
+                lambda: serialize_json_yaml(payload), number=count
+            )
+            / count,
+            "direct": timeit.timeit(
+                lambda: serialize(payload, fmt="yaml"), number=count
+            )
+            / count,
+        }
+    return results
+
+
+def report(results):
+    "Print timings per payload"
+    for payload_name, result in results.items():
+        result = dict(result)
+        print(f"{payload_name} ({result.pop('nodes')} nodes)")
+        for mode, duration in result.items():
+            print(f"  {mode:<18}{duration * 1000:.4f}ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,135 @@
+"""
+Benchmark suite of node trees
+
+Measure tree construction, attribute access, get_value(lvl=-1), serialize
+and dump on synthetic payloads. Results are written as JSON, so runs can be
+compared across versions with --compare.
+
+Usage:
+    python -m benchmarks.bench_suite [--width 6] [--depth 4] [--list-len 3]
+        [--schema] [--number 3] [--output results.json]
+        [--compare previous.json]
+"""
+
+import io
+import sys
+import json
+import timeit
+import logging
+import contextlib
+
+import cafram.nodes
+from cafram.utils import serialize
+
+from benchmarks.common import make_parser, get_metadata, write_results
+from benchmarks.generators import make_payload, make_class, count_nodes
+
+
+def build(cls, payload):
+    "Build a whole tree"
+    return cls(ident="bench", payload=payload, autoconf=-1)
+
+
+def get_attrs(node):
+    "Return (node, attr) of all attributes of a built tree"
+
+    result = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        children = node.get_children()
+        if isinstance(children, dict):
+            result.extend((node, attr) for attr in node.get_value())
+            children = children.values()
+        stack.extend(children or [])
+    return result
+
+
+def access(attrs):
+    "Read all tree attributes"
+    for node, attr in attrs:
+        getattr(node, attr)
+
+
+def dump(node):
+    "Dump a tree, output is discarded"
+    with contextlib.redirect_stdout(io.StringIO()):
+        node.dump()
+
+
+def timing(func, number):
+    "Return best time of one call"
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def run(width=6, depth=4, list_len=3, schema=False, number=3):
+    "Run benchmarks and return results"
+
+    # Values are computed by each get_value() call, not read from cache
+    cafram.nodes.VALUE_CACHE = False
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+    payload = make_payload(width, depth, list_len)
+    cls = make_class(payload, schema=schema)
+    node = build(cls, payload)
+    attrs = get_attrs(node)
+    value = node.get_value(lvl=-1)
+
+    timings = {
+        "build": timing(lambda: build(cls, payload), number),
+        "access": timing(lambda: access(attrs), number),
+        "get_value": timing(lambda: node.get_value(lvl=-1), number),
+        "serialize_json": timing(lambda: serialize(value), number),
+        "serialize_yaml": timing(lambda: serialize(value, fmt="yaml"), number),
+        "dump": timing(lambda: dump(node), number),
+    }
+
+    params = {
+        "width": width,
+        "depth": depth,
+        "list_len": list_len,
+        "schema": schema,
+        "number": number,
+    }
+    return dict(
+        get_metadata(params),
+        nodes=count_nodes(payload),
+        attrs=len(attrs),
+        timings=timings,
+    )
+
+
+def compare(results, previous):
+    "Return timings ratios against previous results"
+    old = previous.get("timings", {})
+    return {
+        name: duration / old[name] if old.get(name) else None
+        for name, duration in results["timings"].items()
+    }
+
+
+def main(argv=None):
+    "Run benchmarks from command line"
+
+    parser = make_parser(run, __doc__)
+    parser.add_argument("--compare", help="Previous JSON results to compare")
+    args = parser.parse_args(argv)
+
+    results = run(args.width, args.depth, args.list_len, args.schema, args.number)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as _file:
+            results["compare"] = compare(results, json.load(_file))
+
+    if args.output:
+        write_results(results, args.output)
+
+    print(f"{results['nodes']} nodes, {results['attrs']} attributes")
+    ratios = results.get("compare", {})
+    for name, duration in results["timings"].items():
+        line = f"{name:<20}{duration:.4f}s"
+        if ratios.get(name):
+            line += f"  x{ratios[name]:.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Benchmark streaming writers
+
+Compare peak memory and time of writing a built tree to a file, with the
+streaming writer (node.write_stream) and with serialize(get_value(lvl=-1)).
+Values cache is disabled, so each write starts from the tree alone.
+
+Usage:
+    python -m benchmarks.bench_writer [--width 8] [--depth 4] [--list-len 3]
+        [--output results.json]
+"""
+
+import os
+import sys
+import time
+import logging
+import tracemalloc
+
+import cafram.nodes
+from cafram.utils import serialize
+
+from benchmarks.common import main
+from benchmarks.generators import make_payload, make_class, count_nodes
+
+
+def write_serialized(node, stream, fmt):
+    "Write the whole document string"
+    stream.write(serialize(node.get_value(lvl=-1), fmt=fmt))
+
+
+def write_streamed(node, stream, fmt):
+    "Write the tree node by node"
+    node.write_stream(stream, fmt=fmt)
+
+
+def measure(func, node, fmt):
+    "Return time and peak memory of one write"
+    with open(os.devnull, "w", encoding="utf-8") as stream:
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(node, stream, fmt)
+        duration = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return duration, peak
+
+
+def run(width=8, depth=4, list_len=3):
+    "Run benchmark and return results"
+
+    logging.getLogger("cafram").setLevel(logging.CRITICAL + 1)
+    cafram.nodes.VALUE_CACHE = False
+    payload = make_payload(width, depth, list_len)
+    node = make_class(payload)(ident="bench", payload=payload, autoconf=-1)
+
+    results = {"nodes": count_nodes(payload)}
+    for fmt in ["json", "yaml"]:
+        for name, func in [("serialize", write_serialized), ("stream", write_streamed)]:
+            results[f"{fmt}_{name}"] = measure(func, node, fmt)
+    return results
+
+
+def report(results):
+    "Print timings and peak memory"
+    results = dict(results)
+    print(f"{'nodes':<20}{results.pop('nodes')}")
+    for mode, (duration, peak) in results.items():
+        print(f"{mode:<20}{duration:.4f}s{peak / 1024 / 1024:>10.2f}MB")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
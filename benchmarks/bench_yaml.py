@@ -0,0 +1,50 @@
+"""
+Benchmark YAML modes
+
+Measure from_yaml and to_yaml throughput on a large payload, with the round
+trip mode and the fast mode (safe, C extension when available).
+
+Usage:
+    python -m benchmarks.bench_yaml [--width 8] [--depth 4] [--list-len 3]
+        [--number 3] [--output results.json]
+"""
+
+import sys
+import timeit
+
+from cafram.utils import from_yaml, to_yaml, CEmitter
+
+from benchmarks.common import main
+from benchmarks.generators import make_payload
+
+
+def run(width=8, depth=4, list_len=3, number=3):
+    "Run benchmark and return MB/s per mode and helper"
+
+    payload = make_payload(width, depth, list_len)
+    string = to_yaml(payload)
+    assert from_yaml(string, fast=True) == from_yaml(string)
+    size = len(string) / 1024 / 1024
+
+    results = {"size": size, "c_extension": CEmitter is not None}
+    for mode, fast in [("roundtrip", False), ("fast", True)]:
+        for name, func in [
+            ("from_yaml", lambda: from_yaml(string, fast=fast)),
+            ("to_yaml", lambda: to_yaml(payload, fast=fast)),
+        ]:
+            duration = timeit.timeit(func, number=number) / number
+            results[f"{name}_{mode}"] = size / duration
+    return results
+
+
+def report(results):
+    "Print throughputs"
+    results = dict(results)
+    print(f"{'size':<20}{results.pop('size'):.2f}MB")
+    print(f"{'c_extension':<20}{results.pop('c_extension')}")
+    for mode, throughput in results.items():
+        print(f"{mode:<20}{throughput:>8.2f}MB/s")
+
+
+if __name__ == "__main__":
+    sys.exit(main(run, report, __doc__))
@@ -0,0 +1,74 @@
+"""
+Benchmarks command line
+
+Benchmarks modules provide a run() function, which keyword arguments are
+exposed as command line options, and a report() function printing results.
+Results can be written as JSON with --output, like bench_suite.
+"""
+
+import json
+import inspect
+import argparse
+import platform
+from datetime import datetime, timezone
+
+
+def get_version():
+    "Return installed cafram version, if any"
+    try:
+        # pylint: disable=import-outside-toplevel
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return None
+    try:
+        return version("cafram")
+    except PackageNotFoundError:
+        return None
+
+
+def get_metadata(params):
+    "Return results metadata of a run with params"
+    return {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "version": get_version(),
+        "params": params,
+    }
+
+
+def write_results(results, path):
+    "Write JSON results to path"
+    with open(path, "w", encoding="utf-8") as _file:
+        _file.write(json.dumps(results, indent=2))
+
+
+def make_parser(run, doc):
+    "Return an argument parser with run() keyword arguments as options"
+
+    parser = argparse.ArgumentParser(
+        description=doc.split("\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    for name, param in inspect.signature(run).parameters.items():
+        option = f"--{name.replace('_', '-')}"
+        helper = name.replace("_", " ")
+        if isinstance(param.default, bool):
+            parser.add_argument(option, action="store_true", help=helper)
+        else:
+            parser.add_argument(
+                option, type=type(param.default), default=param.default, help=helper
+            )
+    parser.add_argument("--output", help="Write JSON results to this file")
+    return parser
+
+
+def main(run, report, doc, argv=None):
+    "Run a benchmark from command line"
+
+    args = vars(make_parser(run, doc).parse_args(argv))
+    output = args.pop("output")
+    results = run(**args)
+    if output:
+        write_results(dict(get_metadata(args), results=results), output)
+    report(results)
+    return 0
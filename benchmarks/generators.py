@@ -0,0 +1,102 @@
+"""
+Synthetic payloads for benchmarks
+
+Payloads are nested dicts and lists, parameterized by width (keys per dict),
+depth (nesting levels) and list length (items per list). Schemas matching
+generated payloads can be generated too.
+"""
+
+from cafram.nodes import NodeAuto, NodeMap
+
+
+def make_leaves(width, seed=0):
+    "Generate a dict of scalar values"
+    result = {}
+    for idx in range(width):
+        kind = idx % 3
+        if kind == 0:
+            result[f"key_{idx}"] = f"value_{seed}_{idx}"
+        elif kind == 1:
+            result[f"key_{idx}"] = seed + idx
+        else:
+            result[f"key_{idx}"] = bool(idx % 2)
+    return result
+
+
+def make_payload(width=6, depth=4, list_len=3, seed=0):
+    """Generate a nested payload
+
+    Each dict holds width keys: scalar values, nested dicts and lists of
+    list_len nested dicts, until depth is reached.
+    """
+
+    if depth <= 0:
+        return make_leaves(width, seed)
+
+    result = {}
+    for idx in range(width):
+        kind = idx % 3
+        if kind == 0:
+            result[f"value_{idx}"] = f"value_{seed}_{idx}"
+        elif kind == 1:
+            result[f"dict_{idx}"] = make_payload(width, depth - 1, list_len, idx)
+        else:
+            result[f"list_{idx}"] = [
+                make_payload(width, depth - 1, list_len, item)
+                for item in range(list_len)
+            ]
+    return result
+
+
+def make_items(items, width=3):
+    "Generate a list of small dicts of scalar values"
+    return [make_leaves(width, idx) for idx in range(items)]
+
+
+def make_deep_payload(depth):
+    "Generate a payload nested depth times"
+    payload = {"leaf": "value"}
+    for idx in range(depth):
+        payload = {"child": payload, "items": [idx]}
+    return payload
+
+
+def make_schema(payload):
+    "Generate a json schema matching payload"
+
+    if isinstance(payload, dict):
+        return {
+            "type": "object",
+            "properties": {key: make_schema(value) for key, value in payload.items()},
+            "required": list(payload),
+        }
+    if isinstance(payload, list):
+        return {"type": "array", "items": make_schema(payload[0]) if payload else {}}
+    if isinstance(payload, bool):
+        return {"type": "boolean"}
+    if isinstance(payload, int):
+        return {"type": "integer"}
+    return {"type": "string"}
+
+
+def make_class(payload, schema=False):
+    """Return the root node class of payload
+
+    Without schema, payloads are built by NodeAuto. With schema, the root
+    class validates the whole payload.
+    """
+
+    if not schema:
+        return NodeAuto
+    conf_schema = {"$schema": "http://json-schema.org/draft-07/schema#"}
+    conf_schema.update(make_schema(payload))
+    return type("BenchSchema", (NodeMap,), {"conf_schema": conf_schema})
+
+
+def count_nodes(payload):
+    "Return the number of containers in payload"
+    if isinstance(payload, dict):
+        return 1 + sum(count_nodes(value) for value in payload.values())
+    if isinstance(payload, list):
+        return 1 + sum(count_nodes(value) for value in payload)
+    return 0
@@ -8,8 +8,9 @@ Also known as: Pshiiit' Knackie ! Framework
 
 import logging
 import textwrap
+import types
 
-from cafram.utils import serialize
+from cafram.utils import serialize, get_cached_logger
 
 _log = logging.getLogger(__name__)
 
@@ -58,11 +59,69 @@ class ApplicationError(CaframException):
     """Raised when the developper introduced a bug"""
 
 
+class PatchError(CaframException):
+    """Raised when a patch can't be applied"""
+
+
+class MissingNode(CaframException):
+    """Raised when a node path does not exist"""
+
+
 # =====================================================================
 # Class helpers
 # =====================================================================
 
 
+class ClassDefault:
+    """Slot backed attribute with a class level default
+
+    Reading the attribute from the class, or from an instance which did not
+    set it yet, returns the default. Instance values are stored in a slot, so
+    compact objects don't need a __dict__.
+
+    The slot is either given as a member descriptor, or as a slot name of the
+    owner class, resolved when the owner class is created.
+    """
+
+    __slots__ = ("member", "default")
+
+    def __init__(self, default=None, member=None):
+        self.default = default
+        self.member = member
+
+    def __set_name__(self, owner, name):
+        if isinstance(self.member, str):
+            self.member = owner.__dict__[self.member]
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self.default
+        try:
+            return self.member.__get__(obj, owner)
+        except AttributeError:
+            return self.default
+
+    def __set__(self, obj, value):
+        self.member.__set__(obj, value)
+
+    def __delete__(self, obj):
+        self.member.__delete__(obj)
+
+
+def _find_slot(cls, name):
+    "Return the slot member backing name in cls parents, if any"
+    for parent in cls.__mro__[1:]:
+        attr = parent.__dict__.get(name)
+        if attr is None:
+            continue
+        if isinstance(attr, ClassDefault):
+            return attr.member
+        if isinstance(attr, types.MemberDescriptorType):
+            return attr
+        return None
+    return None
+
+
 class Base:
     """Base cafram object class
 
@@ -74,6 +133,11 @@ class Base:
 
     Available methods:
     * dump()
+
+    Base and cafram nodes store their state in __slots__. Subclasses get a
+    regular __dict__ unless they declare __slots__ themselves, in which case
+    they stay compact. On compact classes, class level defaults of slotted
+    attributes (ident, kind, ...) are turned into ClassDefault attributes.
     """
 
     # Public attributes
@@ -82,46 +146,106 @@ class Base:
     # Current library name
     module = "cafram"
 
-    # Objects can have names
-    ident = None
-
+    # Objects can have names (ident), defaults to None
     # Object kind, nice name to replace raw class name, should be a string
-    kind = None
+    # Object shortcut to logger (log)
+    # Define live runtime data (shared), created on first access
+    __slots__ = ("ident", "kind", "log", "_shared")
 
-    # Define live runtime data
-    # To be renamed: shared
-    # runtime = {}
+    def __init_subclass__(cls, **kwargs):
+        "Turn class level defaults of slotted attributes into ClassDefault"
 
-    # Optional attributes
-    # ---------------------
+        # pylint: disable=super-with-arguments
+        super(Base, cls).__init_subclass__(**kwargs)
+
+        # Classes with a __dict__ store instance values in it, nothing to do
+        if cls.__dictoffset__:
+            return
+
+        slots = cls.__dict__.get("__slots__", ())
+        for name, value in list(cls.__dict__.items()):
+            if name.startswith("__") or name in slots or hasattr(value, "__get__"):
+                continue
+            member = _find_slot(cls, name)
+            if member is not None:
+                setattr(cls, name, ClassDefault(value, member=member))
+
+    @property
+    def __dict__(self):
+        "Return slots values of compact objects, for introspection"
+        result = {}
+        for cls in reversed(self.__class__.__mro__):
+            for name in cls.__dict__.get("__slots__", ()):
+                member = cls.__dict__[name]
+                try:
+                    result[name] = member.__get__(self, cls)
+                except AttributeError:
+                    pass
+        return result
+
+    def __setstate__(self, state):
+        """Restore copied or unpickled state
 
-    # Object shortcut to logger
-    log = None
-    _node_log = None
+        Attributes are set directly, so subclasses __setattr__ (NodeMap) can't
+        mistake them for config values.
+        """
+        if isinstance(state, tuple):
+            states = state
+        else:
+            states = (state,)
+        for items in states:
+            for name, value in (items or {}).items():
+                object.__setattr__(self, name, value)
 
     def __init__(self, *args, **kwargs):
 
-        self.kind = kwargs.get("kind") or self.kind or self.__class__.__name__
+        self.kind = (
+            kwargs.get("kind") or getattr(self, "kind", None) or self.__class__.__name__
+        )
 
         # Ident management
         if "ident" in kwargs:
             self.ident = kwargs.get("ident")
-        if self.ident is None:
-            raise MissingIdent(f"Missing 'ident' for __init__: {self}, {self.__dict__}")
-
-        self.ident = self.ident or kwargs.get("ident") or self.kind
-
-        self.log = kwargs.get("log") or self.log or logging.getLogger(__name__)
-        self.shared = kwargs.get("shared") or {}
+        ident = getattr(self, "ident", None)
+        if ident is None:
+            raise MissingIdent(
+                f"Missing 'ident' for __init__: {self.__class__.__name__}"
+            )
+
+        self.ident = ident or self.kind
+
+        self.log = (
+            kwargs.get("log")
+            or getattr(self, "log", None)
+            or get_cached_logger(__name__)
+        )
+        shared = kwargs.get("shared")
+        if shared is not None:
+            object.__setattr__(self, "_shared", shared)
+
+    @property
+    def shared(self):
+        "Return object runtime data"
+        try:
+            return self._shared
+        except AttributeError:
+            # Set directly, NodeMap.__setattr__ would look for config values
+            shared = {}
+            object.__setattr__(self, "_shared", shared)
+            return shared
+
+    @shared.setter
+    def shared(self, value):
+        object.__setattr__(self, "_shared", value)
 
     def __str__(self):
         "Return a nice str representation of object"
-        return f"{self.__class__.__name__}:{self.ident}"
+        return f"{self.__class__.__name__}:{getattr(self, 'ident', None)}"
 
     def __repr__(self):
         "Return a nice representation of object"
         # return self._nodes
-        return f"{self.__class__.__name__}.{id(self)} {self.ident}"
+        return f"{self.__class__.__name__}.{id(self)} {getattr(self, 'ident', None)}"
         # return f"Instance {id(self)}: {self.__class__.__name__}:{self.ident}"
 
     # pylint: disable=redefined-builtin
@@ -198,7 +322,7 @@ class MixInLog:
             raise Exception(f"Log not allowed here: {conf_logger}")
 
         if not log:
-            log = logging.getLogger(log_name)
+            log = get_cached_logger(log_name)
 
         # print ("Create logger", log_name, conf_logger, self.conf_logger)
         setattr(self, attribute_name, log)
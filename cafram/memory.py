@@ -0,0 +1,220 @@
+"""
+Memory reports
+
+Report bytes used by built node trees, per node class. Objects referenced
+many times, like payloads shared between raw and parsed configs, logger
+adapters or shared runtime data, are only counted once. Trees construction
+allocations can also be measured with tracemalloc.
+"""
+
+import sys
+import types
+import logging
+import tracemalloc
+
+from cafram.base import Base
+
+# Objects never counted: nodes are counted on their own, and classes,
+# functions, modules and loggers are global. Logger adapters are counted once
+# for the whole tree.
+_skipped_types = (
+    Base,
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    logging.Logger,
+    logging.LoggerAdapter,
+)
+
+# Payloads attributes, other attributes are counted as node attributes
+_payload_attrs = {
+    "_node_conf_raw": "raw",
+    "_node_conf_parsed": "parsed",
+    "_node_value_": "value",
+}
+
+# Attributes shared by a whole tree
+_tree_attrs = {
+    "log": "loggers",
+    "_node_log": "loggers",
+    "_shared": "shared",
+    "_node_lock": "shared",
+    "_node_stats_": "shared",
+    "_node_index_": "shared",
+}
+
+# Links to other nodes, not counted
+_node_links = ("_node_root", "_node_parent")
+
+
+def deep_sizeof(obj, seen):
+    """Return size of obj and of the objects it references
+
+    Objects which ids are in seen are skipped, counted ids are added to seen.
+    """
+
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _skipped_types):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, complex)):
+            attrs = getattr(obj, "__dict__", None)
+            if isinstance(attrs, dict):
+                stack.append(attrs)
+            for cls in type(obj).__mro__:
+                for name in cls.__dict__.get("__slots__", ()):
+                    value = getattr(obj, name, None)
+                    if value is not None:
+                        stack.append(value)
+    return size
+
+
+def logger_sizeof(log, seen):
+    "Return size of a logger adapter, global loggers are not counted"
+
+    if id(log) in seen or not isinstance(log, logging.LoggerAdapter):
+        return 0
+    seen.add(id(log))
+    return sys.getsizeof(log) + deep_sizeof(log.__dict__, seen)
+
+
+# pylint: disable=protected-access
+
+
+def get_built_children(node):
+    "Return built children nodes of a node, without creating lazy ones"
+
+    children = node._nodes
+    if isinstance(children, dict):
+        children = children.values()
+    elif children is None:
+        children = ()
+    if node._node_kind == "List" and node._node_items is not None:
+        children = node._node_items.cache.values()
+    return [child for child in children if isinstance(child, Base)]
+
+
+def get_nodes(node):
+    "Return built nodes of a tree, children first"
+
+    result = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        result.append(node)
+        stack.extend(get_built_children(node))
+
+    result.reverse()
+    return result
+
+
+def get_attrs(node):
+    "Return (name, value) of node slots and instance attributes"
+
+    for cls in type(node).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            try:
+                # Read the slot of cls, even if a subclass shadows its name
+                # pylint: disable=unnecessary-dunder-call
+                yield name, cls.__dict__[name].__get__(node, cls)
+            except AttributeError:
+                pass
+
+    if type(node).__dictoffset__:
+        yield from node.__dict__.items()
+
+
+def memory_report(node):
+    """Return bytes used by a built tree
+
+    Each node class reports its instances count and bytes of node objects,
+    raw payloads, parsed payloads and cached values. Nodes are walked
+    children first, so payloads shared with parents are reported by children
+    classes. Logger adapters and shared objects are reported once for the
+    whole tree.
+    """
+
+    seen = set()
+    classes = {}
+    tree = {"loggers": 0, "shared": 0}
+
+    nodes = get_nodes(node)
+    for item in nodes:
+
+        cls = type(item)
+        name = f"{cls.__module__}.{cls.__qualname__}"
+        report = classes.get(name)
+        if report is None:
+            report = classes[name] = dict.fromkeys(
+                ("count", "node", "raw", "parsed", "value"), 0
+            )
+        report["count"] += 1
+        report["node"] += sys.getsizeof(item)
+        if cls.__dictoffset__:
+            report["node"] += sys.getsizeof(item.__dict__)
+
+        for attr, value in get_attrs(item):
+            if attr in _node_links:
+                continue
+            category = _tree_attrs.get(attr)
+            if category == "loggers":
+                tree[category] += logger_sizeof(value, seen)
+            elif category:
+                tree[category] += deep_sizeof(value, seen)
+            else:
+                category = _payload_attrs.get(attr, "node")
+                report[category] += deep_sizeof(value, seen)
+
+    for report in classes.values():
+        report["total"] = sum(
+            report[category] for category in ("node", "raw", "parsed", "value")
+        )
+
+    total = sum(report["total"] for report in classes.values())
+    return {
+        "nodes": len(nodes),
+        "total": total + tree["loggers"] + tree["shared"],
+        "loggers": tree["loggers"],
+        "shared": tree["shared"],
+        "classes": classes,
+    }
+
+
+def measure_build(cls, *args, **kwargs):
+    """Build a node with tracemalloc, return the node and allocations report
+
+    Reports bytes still allocated after construction (current) and the peak
+    of allocations during construction (peak), in bytes.
+    """
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        node = cls(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    report = {
+        "nodes": len(get_nodes(node)),
+        "current": current - before,
+        "peak": peak - before,
+    }
+    return node, report
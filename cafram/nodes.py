@@ -6,23 +6,46 @@ Config Node classes
 # pylint: disable=arguments-renamed
 # pylint: disable=arguments-differ
 # pylint: disable=unused-argument
-# pylint: disable=logging-fstring-interpolation
+# pylint: disable=protected-access
+# pylint: disable=attribute-defined-outside-init
 
 import os
+import sys
 import copy
 import inspect
 import textwrap
-import json
 import logging
+import time
+import hashlib
+import asyncio
+import functools
+import threading
+import contextvars
+import concurrent.futures
+from collections import OrderedDict
+from contextlib import contextmanager
 
 # from pprint import pprint
 
 import jsonschema
 
-from cafram.utils import serialize, json_validate, truncate
+from cafram.utils import (
+    serialize,
+    json_loads,
+    json_validate,
+    truncate,
+    get_indent_logger,
+    LazyLog,
+    RWLock,
+)
 
+from cafram.patch import parse_path, patch_node, apply_patch
+from cafram.memory import memory_report, measure_build, get_built_children
+from cafram.query import NodeIndex, query_nodes
+from cafram.writer import write_stream
 from cafram.base import (
     Base,
+    ClassDefault,
     DictExpected,
     ListExpected,
     NotExpectedType,
@@ -30,6 +53,7 @@ from cafram.base import (
     InvalidSyntax,
     SchemaError,
     ApplicationError,
+    MissingNode,
 )
 
 
@@ -38,6 +62,25 @@ _log = logging.getLogger(__name__)
 # Display complete payload in logs
 TRUNCATE = -1
 
+# Show payloads content in logs, disabled by default as stringifying
+# payloads at each level is costly on large configs
+LOG_PAYLOAD = False
+
+# Build nodes trees from an explicit work stack instead of recursive
+# constructor calls, so tree depth is not limited by the recursion limit
+ITERATIVE_BUILD = True
+
+# Number of parsed payloads kept by nodes in dedupe mode
+DEDUPE_CACHE_SIZE = 4096
+
+# Cache full depth values of get_value(lvl=-1) until nodes change, disabled
+# by default as cached values are shared between calls, they must not be
+# modified
+VALUE_CACHE = False
+
+# Value of nodes without cached value
+NO_VALUE = object()
+
 # Functions
 # =====================================
 
@@ -57,6 +100,356 @@ def map_container_class(payload):  # map_container_class
     return type(payload)
 
 
+# Parsed payloads cache of dedupe mode, by class and structural hash
+_dedupe_cache = OrderedDict()
+_dedupe_stats = {"hits": 0, "misses": 0}
+_dedupe_lock = threading.Lock()
+
+
+def dedupe_key(node, payload):
+    "Return the structural hash of a node payload"
+    digest = hashlib.blake2b(repr(payload).encode(), digest_size=16).digest()
+    return (node.__class__, node._node_autoconf, digest)
+
+
+def dedupe_cache_stats():
+    "Return dedupe cache statistics"
+    hits = _dedupe_stats["hits"]
+    total = hits + _dedupe_stats["misses"]
+    return {
+        "hits": hits,
+        "misses": _dedupe_stats["misses"],
+        "size": len(_dedupe_cache),
+        "ratio": hits / total if total else 0.0,
+    }
+
+
+def dedupe_cache_clear():
+    "Clear dedupe cache and statistics"
+    with _dedupe_lock:
+        _dedupe_cache.clear()
+        _dedupe_stats["hits"] = 0
+        _dedupe_stats["misses"] = 0
+
+
+def dedupe_cache_get(key):
+    "Return cached parsed payload and state of a dedupe key"
+    with _dedupe_lock:
+        cached = _dedupe_cache.get(key)
+        if cached is not None:
+            _dedupe_cache.move_to_end(key)
+            _dedupe_stats["hits"] += 1
+        return cached
+
+
+def dedupe_cache_set(key, value):
+    "Cache parsed payload and state of a dedupe key"
+    with _dedupe_lock:
+        _dedupe_stats["misses"] += 1
+        _dedupe_cache[key] = value
+        if len(_dedupe_cache) > DEDUPE_CACHE_SIZE:
+            _dedupe_cache.popitem(last=False)
+
+
+class BuildStats:
+    """Wall time and calls count of deserialization phases, per node class
+
+    Phases are: validate, transform, defaults, conf, build, children, final
+    and dedupe (parsed payload reused). The build phase time includes
+    children subtrees builds, and async hooks time includes waits.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def add(self, node, phase, start):
+        "Record a phase started at start, return current time"
+        now = time.perf_counter()
+        key = (node.__class__, phase)
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                entry = self.data[key] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += now - start
+        return now
+
+    def report(self):
+        "Return phases calls and time, by node class name"
+        result = {}
+        with self.lock:
+            items = list(self.data.items())
+        for (cls, phase), (calls, duration) in items:
+            name = f"{cls.__module__}.{cls.__qualname__}"
+            result.setdefault(name, {})[phase] = {"calls": calls, "time": duration}
+        return result
+
+    def slowest(self, count=10):
+        "Return (class name, phase, time, calls) of slowest phases"
+        result = [
+            (cls, phase, values["time"], values["calls"])
+            for cls, phases in self.report().items()
+            for phase, values in phases.items()
+        ]
+        result.sort(key=lambda item: item[2], reverse=True)
+        return result[:count]
+
+    def clear(self):
+        "Clear statistics"
+        with self.lock:
+            self.data.clear()
+
+
+# Set while building trees with statistics
+_build_stats = contextvars.ContextVar("cafram_build_stats", default=None)
+
+
+@contextmanager
+def collect_stats(stats=None):
+    """Collect deserialization statistics of nodes built in this context
+
+    Yields the BuildStats, which is also set on built root nodes.
+    """
+
+    stats = BuildStats() if stats is None else stats
+    token = _build_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _build_stats.reset(token)
+
+
+def read_locked(func):
+    "Run node method with the tree read lock held, in lock mode"
+
+    @functools.wraps(func)
+    def _wrapper(self, *args, **kwargs):
+        lock = self._node_lock
+        if lock is None:
+            return func(self, *args, **kwargs)
+        with lock.read():
+            return func(self, *args, **kwargs)
+
+    return _wrapper
+
+
+def write_locked(func):
+    "Run node method with the tree write lock held, in lock mode"
+
+    @functools.wraps(func)
+    def _wrapper(self, *args, **kwargs):
+        lock = self._node_lock
+        if lock is None:
+            return func(self, *args, **kwargs)
+        with lock.write():
+            return func(self, *args, **kwargs)
+
+    return _wrapper
+
+
+# Build steps markers, to await a hook result or to create many children
+BUILD_AWAIT = "__await__"
+BUILD_BATCH = "__batch__"
+
+# Set while async builds run, so nodes create their children in batches
+_build_async = contextvars.ContextVar("cafram_build_async", default=False)
+
+
+def _build_sync(kind, data):
+    "Handle build steps markers in synchronous builds"
+
+    if kind == BUILD_AWAIT:
+        data.close()
+        raise ApplicationError(f"Async hooks requires an async build: {data}")
+    return [cls(**kwargs) for cls, kwargs in data]
+
+
+def _build_splitted(cls):
+    "Return True if cls instances can be created without their constructor"
+    return (
+        cls.__init__ is NodeVal.__init__
+        and cls.deserialize is NodeVal.deserialize
+        and cls.__new__ is object.__new__
+    )
+
+
+def _build_stepped(cls):
+    """Return True if cls instances children are built from their build steps
+
+    Classes overriding _node_conf_build build their children synchronously.
+    """
+    return cls._node_conf_build in (
+        NodeList._node_conf_build,
+        NodeDict._node_conf_build,
+    )
+
+
+def build_recursive(steps):
+    "Run node build steps, children nodes are created by their constructor"
+
+    try:
+        spec = next(steps)
+        while True:
+            cls, kwargs = spec
+            if isinstance(cls, str):
+                spec = steps.send(_build_sync(cls, kwargs))
+            else:
+                spec = steps.send(cls(**kwargs))
+    except StopIteration as stop:
+        return stop.value
+
+
+def build_iterative(steps):
+    """Run node build steps, children nodes are created from a work stack
+
+    Nodes build steps yield the class and the arguments of each children to
+    create, and receive the children node once fully built. Children are
+    built depth first, so hooks are run in the same order than recursive
+    builds. Classes overriding __new__, __init__ or deserialize are created
+    by their constructor.
+    """
+
+    stack = [steps]
+    value = None
+    while stack:
+        try:
+            cls, kwargs = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+
+        if isinstance(cls, str):
+            value = _build_sync(cls, kwargs)
+            continue
+        steps = _build_steps(cls, kwargs)
+        if steps is None:
+            value = cls(**kwargs)
+        else:
+            stack.append(steps)
+            value = None
+
+    return value
+
+
+def _build_steps(cls, kwargs):
+    """Create a node without its constructor, and return its build steps
+
+    Return None if cls instances must be created by their constructor.
+    """
+
+    if not _build_splitted(cls):
+        return None
+    node = cls.__new__(cls)
+    payload = kwargs.pop("payload", None)
+    node._node_init(**kwargs)
+    return node._node_deserialize(payload)
+
+
+async def build_async(steps, semaphore):
+    """Run node build steps, awaiting async hooks
+
+    Children nodes are requested in batches, and built concurrently. Async
+    hooks are awaited with semaphore held, if any, which limits the number of
+    hooks running at the same time.
+    """
+
+    value = None
+    while True:
+        try:
+            cls, kwargs = steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+
+        if cls == BUILD_AWAIT:
+            if semaphore is None:
+                value = await kwargs
+            else:
+                async with semaphore:
+                    value = await kwargs
+        elif cls == BUILD_BATCH:
+            value = await asyncio.gather(
+                *[_build_async_child(cls, kwargs, semaphore) for cls, kwargs in kwargs]
+            )
+        else:
+            value = await _build_async_child(cls, kwargs, semaphore)
+
+
+async def _build_async_child(cls, kwargs, semaphore):
+    "Create a node with async build steps"
+
+    steps = _build_steps(cls, kwargs)
+    if steps is None:
+        return cls(**kwargs)
+    return await build_async(steps, semaphore)
+
+
+# Set in parallel build workers, nested children are built serially
+PARALLEL_WORKER = False
+
+
+def _parallel_init():
+    "Initialize parallel build worker process"
+    # pylint: disable=global-statement
+    global PARALLEL_WORKER
+    PARALLEL_WORKER = True
+
+
+def _parallel_build(specs):
+    "Create children nodes as roots, in a worker process"
+    return [cls(**kwargs) for cls, kwargs in specs]
+
+
+def reattach_node(node, parent):
+    "Attach a node tree built as a root to its parent"
+
+    node._node_parent = parent
+    index = parent._node_root._node_index
+    stack = [(node, parent)]
+    while stack:
+        node, parent = stack.pop()
+        node._node_root = parent._node_root
+        node._node_lvl = parent._node_lvl + 1
+        node._node_log = get_indent_logger(node._node_lvl)
+        node._node_lock = parent._node_lock
+        if index is not None:
+            index.add(node)
+
+        stack.extend((child, node) for child in get_built_children(node))
+
+
+def build_parallel(node, specs, processes):
+    """Create children nodes of node in a process pool
+
+    Specs are (cls, ident, payload, key) tuples. Children are created as roots in
+    worker processes, then attached to node, so their hooks can't access
+    their parents nor shared data. Returns children in specs order.
+    """
+
+    options = {
+        "autoconf": node._node_autoconf,
+        "lazy": node._node_lazy,
+        "dedupe": node._node_dedupe,
+    }
+    specs = [
+        (cls, {"ident": ident, "payload": payload, "key": key, **options})
+        for cls, ident, payload, key in specs
+    ]
+    size = max(1, -(-len(specs) // (processes * 4)))
+    chunks = [specs[idx : idx + size] for idx in range(0, len(specs), size)]
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, initializer=_parallel_init
+    ) as pool:
+        chunks = pool.map(_parallel_build, chunks)
+        children = [child for chunk in chunks for child in chunk]
+
+    for child in children:
+        reattach_node(child, node)
+    return children
+
+
 def map_node_class(payload):  # map_node_class
     "Map anything to cafram classes"
 
@@ -69,6 +462,11 @@ def map_node_class(payload):  # map_node_class
     return NodeVal
 
 
+def log_payload(payload):
+    "Return a lazy payload representation for logs"
+    return LazyLog(payload, max=TRUNCATE if LOG_PAYLOAD else None)
+
+
 # Simple attributes class
 # =====================================
 
@@ -90,30 +488,143 @@ class NodeVal(Base):
     conf_ident = None
     conf_children = None
 
+    # Create children nodes on first access instead of during deserialize.
+    # None inherits the parent node setting. Lazy children are validated and
+    # fully built (with all their hooks) on first access, then registered in
+    # their parent and the item hook from conf_children is executed.
+    conf_lazy = None
+
+    # Reuse parsed payloads of identical (class, payload) nodes, instead of
+    # validating, transforming and applying defaults again. None inherits the
+    # parent node setting. Only for nodes which don't depend on anything
+    # else than their payload, and hooks which don't change payloads in place.
+    conf_dedupe = None
+
+    # Create children nodes in a process pool when a node has at least
+    # conf_parallel_threshold children to create. conf_parallel is the number
+    # of processes, True uses all CPUs. Children payloads and nodes must be
+    # picklable, and their hooks can't access their parents.
+    conf_parallel = False
+    conf_parallel_threshold = 1000
+
+    # Protect the tree with a readers-writer lock, set on root nodes. Reads
+    # (attributes, get_value, get_children) can run from many threads while
+    # writes (attributes, deserialize, patches) are exclusive.
+    conf_lock = False
+
+    # Maximum number of async hooks running at the same time, in abuild().
+    # None does not limit them.
+    conf_async_limit = None
+
+    # Record deserialization phases statistics of trees, see get_stats()
+    conf_stats = False
+
+    # Index nodes of trees by class and by name, set on root nodes. Indexes
+    # answer queries by class or by name at any depth, see query_nodes().
+    conf_index = False
+
     # Class internal attributes
-    _nodes = None
-    _node_root = None
-    _node_parent = None
     _node_parent_kind = []
-
-    _node_conf_raw = None
-    _node_conf_parsed = None
-    _node_autoconf = 0
-    _node_lvl = 0
     _node_kind = "Value"
 
-    def __init__(self, *args, parent=None, payload=None, autoconf=None, **kwargs):
+    # Instance internal attributes
+    __slots__ = (
+        "_nodes_",
+        "_node_root",
+        "_node_parent",
+        "_node_key",
+        "_node_conf_raw",
+        "_node_conf_parsed",
+        "_node_autoconf",
+        "_node_lvl",
+        "_node_lazy",
+        "_node_dedupe",
+        "_node_lock",
+        "_node_log",
+        "_node_stats_",
+        "_node_index_",
+        "_node_value_",
+    )
+    _nodes = ClassDefault(None, member="_nodes_")
+    _node_value = ClassDefault(NO_VALUE, member="_node_value_")
+    _node_stats = ClassDefault(None, member="_node_stats_")
+    _node_index = ClassDefault(None, member="_node_index_")
+
+    def __init__(self, *args, payload=None, **kwargs):
+        # pylint: disable=super-init-not-called
+        # Parents are initialized by _node_init()
+        self._node_init(*args, **kwargs)
+        self.deserialize(payload)
+
+    @classmethod
+    async def abuild(cls, *args, payload=None, limit=None, **kwargs):
+        """Create a node tree from an event loop, and return the root node
+
+        Hooks may be async functions, they are awaited. Children nodes of a
+        same parent are built concurrently, so independent subtrees hooks can
+        run at the same time, while each node still runs its hooks in the
+        usual order. Siblings batches end with the first conf_children item
+        having a hook, so item hooks run in their usual order too. limit is
+        the maximum number of hooks awaited at the same time, defaults to
+        conf_async_limit. Lazy children, and classes overriding __init__ or
+        deserialize, are built synchronously.
+        """
+
+        if not _build_splitted(cls):
+            return cls(*args, payload=payload, **kwargs)
+
+        limit = limit or cls.conf_async_limit
+        semaphore = asyncio.Semaphore(limit) if limit else None
+
+        node = cls.__new__(cls)
+        node._node_init(*args, **kwargs)
+        lock = node._node_lock
+        if lock is not None:
+            lock.acquire_write()
+        stats = node._node_stats_init()
+        token = _build_async.set(True)
+        stats_token = _build_stats.set(stats)
+        try:
+            await build_async(node._node_deserialize(payload), semaphore)
+        finally:
+            _build_stats.reset(stats_token)
+            _build_async.reset(token)
+            if lock is not None:
+                lock.release_write()
+        return node
+
+    def _node_init(
+        self,
+        *args,
+        parent=None,
+        key=None,
+        autoconf=None,
+        lazy=None,
+        dedupe=None,
+        lock=None,
+        index=None,
+        **kwargs,
+    ):
+        "Initialize node, before its deserialization"
+
+        # Trees share their root lock
+        if parent is not None:
+            self._node_lock = parent._node_lock
+        else:
+            lock = self.conf_lock if lock is None else lock
+            self._node_lock = RWLock() if lock else None
 
         # Call parents
         # pylint: disable=super-with-arguments
         super(NodeVal, self).__init__(*args, **kwargs)
 
         # Register parent
-        self._node_parent = parent or self
+        self._node_parent = parent if parent is not None else self
         assert isinstance(
             self._node_parent, NodeVal
         ), f"Parent of {self} is not a NodeVal descendant object, got: {self._node_parent}"
-        self._node_root = getattr(parent, "_node_root", None) or self
+        self._node_root = parent._node_root if parent is not None else self
+        self._node_key = key
 
         # Enforce parrent type
         if self._node_parent_kind:
@@ -124,45 +635,129 @@ class NodeVal(Base):
 
         # Manage autoconf levels
         if autoconf is None:
-            autoconf = getattr(self._node_parent, "_node_autoconf", 0)
+            autoconf = parent._node_autoconf if parent is not None else 0
         self._node_autoconf = (autoconf - 1) if autoconf > 0 else autoconf
 
-        # Manage node level
-        self._node_lvl = getattr(self._node_parent, "_node_lvl", -1) + 1
+        # Manage lazy children creation
+        if lazy is None:
+            lazy = self.conf_lazy
+        if lazy is None:
+            lazy = parent._node_lazy if parent is not None else False
+        self._node_lazy = lazy
 
-        # Manage log indentation
-        class CustomAdapter(logging.LoggerAdapter):
-            "LoggerADpater to manage logging indentation"
+        # Manage payloads dedupe
+        if dedupe is None:
+            dedupe = self.conf_dedupe
+        if dedupe is None:
+            dedupe = parent._node_dedupe if parent is not None else False
+        self._node_dedupe = dedupe
 
-            def process(self, msg, kwargs):
-                indent = kwargs.pop("indent", self.extra["indent"])
-                return f"{indent}{msg}", kwargs
+        # Manage node level
+        self._node_lvl = parent._node_lvl + 1 if parent is not None else 1
 
-            def __getattr__(self, name):
-                "Forward unknown attributes such as custom levels in logger"
-                return getattr(self.logger, name)
+        # Manage log indentation
+        self._node_log = get_indent_logger(self._node_lvl)
 
-        indent = "| " * self._node_lvl  # +  "  "
-        self._node_log = CustomAdapter(logging.getLogger('cafram'), {"indent": indent})
+        # Register node in its tree index
+        if parent is None:
+            index = self.conf_index if index is None else index
+            self._node_index = NodeIndex() if index else None
+        index = self._node_root._node_index
+        if index is not None:
+            index.add(self)
 
         # Auto init object
         self.node_hook_init()
-        self.deserialize(payload)
 
     # Serialization
     # -----------------
 
+    @write_locked
     def deserialize(self, payload):
         "Transform json to object"
 
+        self._node_dirty()
+        steps = self._node_deserialize(payload)
+        stats = self._node_stats_init()
+        if stats is None:
+            self._node_build(steps)
+            return
+
+        token = _build_stats.set(stats)
+        try:
+            self._node_build(steps)
+        finally:
+            _build_stats.reset(token)
+
+    @staticmethod
+    def _node_build(steps):
+        "Run deserialization steps"
+        if ITERATIVE_BUILD:
+            build_iterative(steps)
+        else:
+            build_recursive(steps)
+
+    def _node_stats_init(self):
+        "Return statistics to record, and set them on root nodes"
+
+        stats = _build_stats.get()
+        root = self._node_root
+        if stats is None:
+            stats = root._node_stats
+            if stats is None and root.conf_stats:
+                stats = root._node_stats = BuildStats()
+        elif root is self:
+            self._node_stats = stats
+        return stats
+
+    def get_stats(self):
+        "Return deserialization statistics of the tree, if recorded"
+        return self._node_root._node_stats
+
+    def get_memory_report(self, mode="sizeof"):
+        """Return memory used by the node and its children
+
+        sizeof mode walks built nodes and reports bytes per node class, see
+        cafram.memory.memory_report(). tracemalloc mode builds the node again
+        from its raw payload and reports construction allocations, hooks are
+        run again.
+        """
+
+        if mode == "sizeof":
+            return memory_report(self)
+        if mode == "tracemalloc":
+            _, report = measure_build(
+                self.__class__,
+                ident=self.ident,
+                payload=self._node_conf_raw,
+                autoconf=self._node_autoconf,
+                lazy=self._node_lazy,
+                dedupe=self._node_dedupe,
+            )
+            return report
+        raise Exception(f"Unknown mode: {mode}")
+
+    def _node_deserialize(self, payload):
+        """Deserialization steps, yield children to create
+
+        See build_iterative() for the children creation protocol.
+        """
+
         # 0. Init
         # -------------------
 
         # pylint: disable=W0212
+        index = self._node_root._node_index
+        if index is not None:
+            index.discard_children(self)
         self._nodes = self.__class__._nodes
         self._node_conf_raw = payload
 
-        self._node_log.info(f"> Deserialize Node: {self}")
+        # Log levels are checked once per node, so disabled logs cost nothing
+        log = self._node_log
+        debug = log.isEnabledFor(logging.DEBUG)
+        if debug or log.isEnabledFor(logging.INFO):
+            log.info("> Deserialize Node: %s", self)
 
         # 1. Parse config
         # -------------------
@@ -171,17 +766,48 @@ class NodeVal(Base):
         # 1.3 Apply defaults from conf_children or conf_default
         # 1.4 User report
 
-        self._node_log.debug(f"  1. Validate {self} config")
-        payload1 = self._node_conf_validate(payload)
-        self._node_log.debug(f"  2. Hook: node_hook_transform {self} config")
-        payload2 = self.node_hook_transform(payload1)
-        self._node_log.debug(f"  3. Apply conf defaults {self} config")
-        payload3 = self._node_conf_defaults(payload2)
-
-        if payload1 != payload3:
-            self._node_log.debug(f"    3.3 Payload transformation for: {self}")
-            self._node_log.debug(f"         in: {payload1}")
-            self._node_log.debug(f"        out: {payload3}")
+        # Phases are timed only when statistics are recorded
+        stats = _build_stats.get()
+        start = time.perf_counter() if stats is not None else None
+
+        key = dedupe_key(self, payload) if self._node_dedupe else None
+        cached = dedupe_cache_get(key) if key is not None else None
+        if cached is not None:
+            if debug:
+                log.debug("  1. Reuse %s parsed config", self)
+            payload1, payload2, payload3 = cached[0]
+            payload3 = copy.copy(payload3)
+            self._node_conf_restore(cached[1])
+            if stats is not None:
+                start = stats.add(self, "dedupe", start)
+        else:
+            if debug:
+                log.debug("  1. Validate %s config", self)
+            payload1 = self._node_conf_validate(payload)
+            if stats is not None:
+                start = stats.add(self, "validate", start)
+            if debug:
+                log.debug("  2. Hook: node_hook_transform %s config", self)
+            payload2 = self.node_hook_transform(payload1)
+            if inspect.isawaitable(payload2):
+                payload2 = yield BUILD_AWAIT, payload2
+            if stats is not None:
+                start = stats.add(self, "transform", start)
+            if debug:
+                log.debug("  3. Apply conf defaults %s config", self)
+            payload3 = self._node_conf_defaults(payload2)
+            if stats is not None:
+                start = stats.add(self, "defaults", start)
+
+        if key is not None and cached is None:
+            # Payloads are kept for conf_ident, which is formatted from locals
+            payloads = tuple(copy.copy(item) for item in (payload1, payload2, payload3))
+            dedupe_cache_set(key, (payloads, self._node_conf_state()))
+
+        if debug and payload1 != payload3:
+            log.debug("    3.3 Payload transformation for: %s", self)
+            log.debug("         in: %s", log_payload(payload1))
+            log.debug("        out: %s", log_payload(payload3))
 
         # 2. Apply config
         # -------------------
@@ -189,8 +815,11 @@ class NodeVal(Base):
         # 2.2 Run conf hook (node_hook_conf)
 
         self._node_conf_parsed = payload3
-        self._node_log.debug(f"  4. Hook: node_hook_conf {self} config")
-        self.node_hook_conf()
+        if debug:
+            log.debug("  4. Hook: node_hook_conf %s config", self)
+        yield from self._node_hook("node_hook_conf")
+        if stats is not None:
+            start = stats.add(self, "conf", start)
 
         # 3. Create children
         # -------------------
@@ -198,10 +827,19 @@ class NodeVal(Base):
         # 3.2 Run children hook (node_hook_children)
         # 3.3 Preset default ident
 
-        self._node_log.debug(f"  5. Build {self} config")
-        self._node_conf_build()
-        self._node_log.debug(f"  6. Hook: node_hook_children {self} config")
-        self.node_hook_children()
+        if debug:
+            log.debug("  5. Build %s config", self)
+        if _build_stepped(type(self)):
+            yield from self._node_conf_steps()
+        else:
+            self._node_conf_build()
+        if stats is not None:
+            start = stats.add(self, "build", start)
+        if debug:
+            log.debug("  6. Hook: node_hook_children %s config", self)
+        yield from self._node_hook("node_hook_children")
+        if stats is not None:
+            start = stats.add(self, "children", start)
         if self.conf_ident:
             try:
                 self.ident = self.conf_ident.format(**locals())
@@ -209,9 +847,19 @@ class NodeVal(Base):
                 msg = f"Bug: on '{self}.conf_ident={self.conf_ident}', {err.args[0]}"
                 raise ApplicationError(msg) from err
 
-        self._node_log.debug(f"  7. Node {self} has been created")
+        if debug:
+            log.debug("  7. Node %s has been created", self)
 
-        self.node_hook_final()
+        yield from self._node_hook("node_hook_final")
+        if stats is not None:
+            stats.add(self, "final", start)
+        return self
+
+    def _node_hook(self, name):
+        "Run a hook without result, await it if it returns an awaitable"
+        result = getattr(self, name)()
+        if inspect.isawaitable(result):
+            yield BUILD_AWAIT, result
 
     def serialize(self, mode="parsed"):
         "Transform object to json"
@@ -227,6 +875,14 @@ class NodeVal(Base):
 
         return value
 
+    @read_locked
+    def write_stream(self, stream, fmt="json"):
+        """Write the full depth value of the node to a file like object
+
+        Children are written one by one, without building the whole value.
+        """
+        write_stream(self, stream, fmt=fmt)
+
     # User hooks
     # -----------------
 
@@ -262,6 +918,23 @@ class NodeVal(Base):
 
         return payload or self.conf_default
 
+    def _node_parallel(self, count):
+        "Return the number of processes to create count children, 0 if serial"
+
+        parallel = self.conf_parallel
+        if not parallel or PARALLEL_WORKER or count < self.conf_parallel_threshold:
+            return 0
+        if parallel is True:
+            return os.cpu_count() or 1
+        return parallel
+
+    def _node_conf_state(self):
+        "Return node state built while parsing payload, for dedupe mode"
+        return None
+
+    def _node_conf_restore(self, state):
+        "Restore node state built while parsing payload, for dedupe mode"
+
     def _node_conf_validate(self, payload):
         """Validate config against schema
 
@@ -281,8 +954,13 @@ class NodeVal(Base):
                     payload = json_validate(self.conf_schema, payload)
                 except jsonschema.exceptions.ValidationError as err:
 
-                    self._node_log.critical(f"Value: {err.instance}")
-                    self._node_log.critical(f"Payload: {payload}")
+                    # Error paths always show payloads
+                    self._node_log.critical(
+                        "Value: %s", LazyLog(err.instance, max=TRUNCATE)
+                    )
+                    self._node_log.critical(
+                        "Payload: %s", LazyLog(payload, max=TRUNCATE)
+                    )
                     raise SchemaError(
                         f"Schema validation error for {self}: {err.message}"
                     ) from err
@@ -311,18 +989,51 @@ class NodeVal(Base):
     # Simple Class implementation
     # -----------------
     def _node_conf_build(self):
-        "Just assign the value, thats all"
+        """Just assign the value, thats all
+
+        Containers build their children from _node_conf_steps().
+        """
         self._nodes = None
 
+    def _node_conf_steps(self):
+        """Yield children to create, and receive them once built
+
+        Values have no children, they are built by _node_conf_build().
+        """
+        self._node_conf_build()
+        yield from ()
+
     # Misc
     # -----------------
 
-    def from_json(self, payload):
-        "Load from json string"
+    def from_json(self, payload, fast=False):
+        "Load from json string, fast mode uses orjson"
 
-        payload = json.loads(payload)
+        payload = json_loads(payload, fast=fast)
         return self.deserialize(payload)
 
+    # Patches
+    # -----------------
+
+    @write_locked
+    def set_path(self, path, value):
+        "Set value at path, rebuild only affected nodes and return the rebuilt one"
+        return patch_node(self, "set", path, value)
+
+    @write_locked
+    def del_path(self, path):
+        "Remove value at path, rebuild only affected nodes and return the rebuilt one"
+        return patch_node(self, "remove", path)
+
+    @write_locked
+    def apply_patch(self, patch):
+        "Apply a JSON Patch (RFC 6902), see cafram.patch"
+        return apply_patch(self, patch)
+
+    def get_lock(self):
+        "Return the tree readers-writer lock, None if not in lock mode"
+        return self._node_lock
+
     # Node management
     # -----------------
 
@@ -333,6 +1044,10 @@ class NodeVal(Base):
     # get_value
     #   - return ALL but node objects
 
+    def _node_child(self, seg):
+        "Return the children node of a path segment, values have none"
+        raise MissingNode(f"No children node '{seg}' in value {self}")
+
     def get_children(self, lvl=0, explain=False, leaves=False):
         """A nodeVal can't have a children, so always return None"""
         result = None
@@ -350,20 +1065,40 @@ class NodeVal(Base):
     def get_value(self, **kwargs):
         """Return the _nodes value (value+children)"""
 
+        if VALUE_CACHE:
+            self._node_value = self._node_conf_parsed
         return self._node_conf_parsed
 
+    def _node_dirty(self):
+        """Clear cached values of node and of its parents
+
+        Parents values are only cached when all their children values are,
+        so parents of a node without cached value have none either.
+        """
+        node = self
+        while node._node_value is not NO_VALUE:
+            del node._node_value
+            node = node._node_parent
+
+    def _node_cache_value(self, value, children):
+        "Cache full depth value if all children values are cached"
+        for child in children:
+            if isinstance(child, NodeVal) and child._node_value is NO_VALUE:
+                return
+        self._node_value = value
+
     # Sibling management
     # -----------------
 
     def is_root(self):
         """Return True if object is root"""
-        if self._node_parent and self._node_parent == self:
+        if self._node_parent is self:
             return True
         return False
 
     def get_parent(self):
         """Return first parent"""
-        return self._node_parent or None
+        return self._node_parent
 
     def get_parent_root(self):
         """Return root parent object"""
@@ -374,15 +1109,58 @@ class NodeVal(Base):
 
         parents = []
         current = self
-        parent = self._node_parent or None
-        while parent is not None and parent != current:
-            if parent not in parents:
-                parents.append(parent)
-                current = parent
-                parent = getattr(current, "_node_parent")
+        parent = self._node_parent
+        while parent is not None and parent is not current:
+            parents.append(parent)
+            current = parent
+            parent = current._node_parent
 
         return parents
 
+    def get_path(self, pointer=False):
+        """Return node path from its root, as a dotted path or a json pointer
+
+        Path segments are children attributes names and list indexes.
+        """
+
+        keys = []
+        node = self
+        while node._node_parent is not node:
+            keys.append(str(node._node_key))
+            node = node._node_parent
+        keys.reverse()
+
+        if pointer:
+            return "".join(
+                "/" + key.replace("~", "~0").replace("/", "~1") for key in keys
+            )
+        return ".".join(keys)
+
+    def query_nodes(self, path="**", cls=None, where=None):
+        """Return nodes matching query path, relative to this node
+
+        Nodes can also be selected by class and by payload fields values (where
+        dict). See cafram.query for the query syntax.
+        """
+        return query_nodes(self, path=path, cls=cls, where=where)
+
+    def get_node(self, path):
+        """Return children node at path, relative to this node
+
+        Paths are dotted paths (files.3.filters or files[3].filters) or json
+        pointers (/files/3/filters), made of children attributes names and
+        list indexes. Lookups cost one children access per segment.
+        """
+
+        node = self
+        for seg in parse_path(path):
+            child = node._node_child(seg)
+            if not isinstance(child, NodeVal):
+                raise MissingNode(f"No children node '{seg}' in {node}: {path}")
+            node = child
+
+        return node
+
     # Dumper
     # -----------------
 
@@ -490,11 +1268,67 @@ class NodeVal(Base):
 # =====================================
 
 
+class NodeListItems:
+    "Create NodeList children on demand, keep the last used ones in a cache"
+
+    __slots__ = ("cls", "size", "cache")
+
+    def __init__(self, cls, size=None):
+        self.cls = cls
+        self.size = size
+        self.cache = OrderedDict()
+
+    def get(self, node, index):
+        "Return the children node at index, create it if not in cache"
+
+        lock = node._node_lock
+        if lock is None:
+            return self._get(node, index)
+        with lock.building():
+            return self._get(node, index)
+
+    def _get(self, node, index):
+        "Return the children node at index, create it if not in cache"
+
+        cache = self.cache
+        child = cache.get(index)
+        if child is not None:
+            cache.move_to_end(index)
+            return child
+
+        child = self.cls(
+            parent=node,
+            ident=f"{node.ident}_{index}",
+            payload=node._node_conf_parsed[index],
+            key=index,
+        )
+
+        size = self.size
+        if size is None or size > 0:
+            cache[index] = child
+            if size is not None and len(cache) > size:
+                evicted = cache.popitem(last=False)[1]
+                tree_index = node._node_root._node_index
+                if tree_index is not None:
+                    tree_index.discard(evicted)
+                    tree_index.discard_children(evicted)
+
+        return child
+
+
 class NodeList(NodeVal):
     """NodeList"""
 
+    # Number of children nodes kept in memory in lazy mode, None is unlimited.
+    # In lazy mode, children nodes are created on access from their payload,
+    # so an evicted children is recreated on next access. Items are then
+    # different objects, and changes made on them are not kept.
+    conf_lazy_cache = 128
+
+    __slots__ = ("_node_items_",)
     _nodes = []
     _node_conf_parsed = []
+    _node_items = ClassDefault(None, member="_node_items_")
     _node_kind = "List"
 
     # Overrides
@@ -510,14 +1344,49 @@ class NodeList(NodeVal):
         return payload
 
     def _node_conf_build(self):
-        "Just assign the value, thats all NodeList"
+        "Build children synchronously, for NodeList"
+        build_recursive(self._node_conf_steps())
+
+    def _node_conf_steps(self):
+        "Yield children to create, for NodeList"
 
         payload = self._node_conf_parsed
+        self._node_items = None
         if not payload:
             self._nodes = []
             return
 
         cls = self.conf_children
+        if self._node_autoconf != 0:
+            cls = cls or map_container_class(payload[0])
+
+        if inspect.isclass(cls) and issubclass(cls, NodeVal):
+
+            # Lazy mode, children nodes are created on access
+            if self._node_lazy:
+                self._nodes = []
+                self._node_items = NodeListItems(cls, size=self.conf_lazy_cache)
+                return
+
+            # Parallel mode, children nodes are created in a process pool
+            processes = self._node_parallel(len(payload))
+            if processes:
+                specs = [
+                    (cls, f"{self.ident}_{idx}", item, idx)
+                    for idx, item in enumerate(payload)
+                ]
+                self._nodes = build_parallel(self, specs, processes)
+                return
+
+            # Async mode, children nodes are created concurrently
+            if _build_async.get():
+                specs = []
+                for idx, item in enumerate(payload):
+                    kwargs = {"parent": self, "ident": f"{self.ident}_{idx}"}
+                    kwargs.update(payload=item, key=idx)
+                    specs.append((cls, kwargs))
+                self._nodes = yield BUILD_BATCH, specs
+                return
 
         results = []
         count = -1
@@ -540,7 +1409,12 @@ class NodeList(NodeVal):
 
                 if issubclass(cls, NodeVal):
                     are_children = True
-                    result = cls(parent=self, ident=ident, payload=item)
+                    result = yield cls, {
+                        "parent": self,
+                        "ident": ident,
+                        "payload": item,
+                        "key": count,
+                    }
                 elif cls:
 
                     are_children = False
@@ -571,13 +1445,49 @@ class NodeList(NodeVal):
         else:
             self._node_conf_parsed = results
 
+    # Sequence protocol
+    # -------------------
+
     def __iter__(self):
-        return self._nodes.__iter__()
+        items = self._node_items
+        if items is None:
+            return self._nodes.__iter__()
+        return (items.get(self, idx) for idx in range(len(self._node_conf_parsed)))
+
+    def __len__(self):
+        if self._node_items is None:
+            return len(self._nodes or self._node_conf_parsed)
+        return len(self._node_conf_parsed)
+
+    def __getitem__(self, index):
+        items = self._node_items
+        if items is None:
+            return (self._nodes or self._node_conf_parsed)[index]
+
+        size = len(self._node_conf_parsed)
+        if isinstance(index, slice):
+            return [items.get(self, idx) for idx in range(*index.indices(size))]
+
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError(f"List index out of range for {self}: {index}")
+        return items.get(self, index)
+
+    # Node management
+    # -------------------
+
+    def _node_child(self, seg):
+        "Return the children node of a list index segment"
+        if seg.isdigit() and int(seg) < len(self):
+            return self[int(seg)]
+        return None
 
+    @read_locked
     def get_children(self, lvl=0, explain=False, leaves=False):
         "Return NodeList childs"
         result = []
-        for child in self._nodes:
+        for child in self:
             if lvl != 0:
                 value = child.get_children(lvl=lvl - 1, explain=explain, leaves=leaves)
             else:
@@ -598,16 +1508,28 @@ class NodeList(NodeVal):
 
         return result
 
+    @read_locked
     def get_value(self, lvl=0, explain=False):
         "Return NodeList value"
+
+        # Full depth values are cached until the node or its children change
+        cache = lvl < 0 and not explain and VALUE_CACHE
+        if cache and self._node_value is not NO_VALUE:
+            return self._node_value
+
         result = []
-        for child in self._nodes:
+        for child in self:
             if lvl != 0:
                 result.append(child.get_value(lvl=lvl - 1, explain=explain))
             else:
                 result.append(child)
 
-        return result or self._node_conf_parsed
+        result = result or self._node_conf_parsed
+
+        # Lazy lists children may be created again, their values are not cached
+        if cache and self._node_items is None:
+            self._node_cache_value(result, self._nodes or ())
+        return result
 
 
 # NodeDict
@@ -615,7 +1537,13 @@ class NodeList(NodeVal):
 
 
 class NodeDictItem:
-    """Children configuration for NodeDict"""
+    """Children configuration for NodeDict
+
+    Items of static conf_children are shared by all instances, they must not
+    be modified once created.
+    """
+
+    __slots__ = ("key", "attr", "hook", "cls", "default", "action", "is_node")
 
     def __init__(
         self,
@@ -631,13 +1559,12 @@ class NodeDictItem:
 
         self.key = key
         self.attr = key if attr == "__UNSET__" else attr
-
-        self._ident = None
         self.hook = hook
 
         self.cls = cls or None
         self.default = default or None
         self.action = action
+        self.is_node = inspect.isclass(cls) and issubclass(cls, NodeVal)
 
     @property
     def ident(self) -> str:
@@ -645,16 +1572,49 @@ class NodeDictItem:
         return self.attr or self.key
 
     def __repr__(self):
-        result = [f"{key}={val}" for key, val in self.__dict__.items() if val]
+        result = [
+            f"{key}={getattr(self, key)}"
+            for key in self.__slots__
+            if getattr(self, key) and key != "is_node"
+        ]
         result = "|".join(result)
         return f"Remap:{result}"
 
 
+# Compiled plans of static conf_children lists, by list identity
+_children_plans = {}
+
+
+def get_children_plan(conf_children):
+    """Return the compiled children plan of a static conf_children list
+
+    Plans are compiled once, then shared by all instances using the same
+    conf_children list. Keys, attrs and hooks names are interned. Changes
+    made in place to conf_children after its first use are not seen.
+    """
+
+    cached = _children_plans.get(id(conf_children))
+    if cached is not None and cached[0] is conf_children:
+        return cached[1]
+
+    plan = []
+    for conf in conf_children:
+        conf = dict(conf)
+        for name in ("key", "attr", "hook"):
+            if isinstance(conf.get(name), str):
+                conf[name] = sys.intern(conf[name])
+        plan.append(NodeDictItem(**conf))
+
+    plan = tuple(plan)
+    _children_plans[id(conf_children)] = (conf_children, plan)
+    return plan
+
+
 class NodeDictItemManager:
     "Manage DictItemChildren"
 
     def __init__(self, conf_children, payload=None, autoconf=None, log=None):
-        self._node_log = log or _log
+        self._node_log = log or get_indent_logger()
 
         self.data = self.load_conf(conf_children, payload=payload, autoconf=autoconf)
 
@@ -668,15 +1628,19 @@ class NodeDictItemManager:
         # Conf_children default behavior: auto from dict
         # conf_children = self.conf_children or {}
         payload = payload or {}
-        log_prefix = "    3."
 
-        # 1. Leave as is
+        # 1. Use static plan, compiled once
         if isinstance(conf_children, list):
-            log_mode = "Keep list as is"
+            self._node_log.info(
+                "    3.1 Children config: %s with %s",
+                "Use compiled plan",
+                log_payload(payload),
+            )
+            return get_children_plan(conf_children)
 
         # 2. Direct generate
-        elif inspect.isclass(conf_children):
-            log_mode = f"Create childs from class: {conf_children}"
+        if inspect.isclass(conf_children):
+            log_mode = "Create childs from class"
             conf_children = [
                 {"key": key, "default": val, "cls": conf_children}
                 for key, val in payload.items()
@@ -703,15 +1667,11 @@ class NodeDictItemManager:
             ]
 
         # Actually build conf_Struct
-        _payload = str(payload)
         self._node_log.info(
-            log_prefix
-            + f"1 Children config: {log_mode} with {truncate(_payload, max=TRUNCATE)}"
+            "    3.1 Children config: %s with %s", log_mode, log_payload(payload)
         )
         conf_struct = [NodeDictItem(**conf) for conf in conf_children]
-        self._node_log.debug(
-            log_prefix + f"1 Children plan: {truncate(conf_struct, max=TRUNCATE)}"
-        )
+        self._node_log.debug("    3.1 Children plan: %s", log_payload(conf_struct))
 
         # Developper sanity check
         if not isinstance(conf_struct, list):
@@ -753,14 +1713,33 @@ class NodeDictItemManager:
         return payload
 
     def build_it(self, node):
-        "Actually create children nodes/values"
+        "Actually create children nodes/values, yield children nodes to create"
 
         assert isinstance(node, NodeDict), f"BUG: Wrong type, expected NodeDict: {self}"
-        log_prefix = "    5."
-        self._node_log.debug(log_prefix + f"1 Build {node} children ...")
+        log = self._node_log
+        info = log.isEnabledFor(logging.INFO)
+        if info:
+            log.debug("    5.1 Build %s children ...", node)
+
+        # 1. Create children nodes in a process pool
+        prebuilt = {}
+        processes = node._node_parallel(len(self.data))
+        if processes:
+            specs = self.parallel_specs(node)
+            if len(specs) >= node.conf_parallel_threshold:
+                children = build_parallel(node, [spec[1:] for spec in specs], processes)
+                prebuilt = {spec[0]: child for spec, child in zip(specs, children)}
+
+        # 1. Or create children nodes concurrently on async builds, in batches
+        # ending with the first item hook, so item hooks run in usual order
+        batched = not processes and _build_async.get()
+
+        # Values are read directly from the parsed payload, keys and attrs of
+        # already created children nodes are hidden like in node.get_value()
+        hidden = set()
 
         # 2. Process each children
-        for item_def in self.data:
+        for index, item_def in enumerate(self.data):
 
             key = item_def.key
             attr = item_def.attr
@@ -770,8 +1749,8 @@ class NodeDictItemManager:
 
             # Get value
             value = None
-            if key:
-                value = node.get_value().get(key)
+            if key and key not in hidden:
+                value = node._node_conf_parsed.get(key)
 
             # Check action
             if not value:
@@ -785,46 +1764,94 @@ class NodeDictItemManager:
             if cls:
                 # pylint: disable=line-too-long
                 # Instanciate or cast value
-                if issubclass(cls, NodeVal):
-
-                    self._node_log.info(
-                        log_prefix
-                        + f"2 Instanciate Children Node object: {attr}={cls}({truncate(value, max=TRUNCATE)})"
-                    )
-                    self._node_log.info(" ")
-                    child = cls(parent=node, ident=item_def.ident, payload=value)
-
-                    log_msg = f"Instanciated Children Node object: {attr}={cls}({truncate(value, max=TRUNCATE)})"
+                if attr and item_def.is_node and node._node_lazy:
+
+                    # Defer children node creation until first access
+                    node._node_pending[attr] = (item_def, value)
+                    hidden.update((key, attr))
+                    log_msg = "Deferred Children Node object: %s=%s(%s)"
+                    log_args = (attr, cls, log_payload(value)) if info else None
+                    hook = None
+
+                elif item_def.is_node:
+
+                    if info:
+                        log.info(
+                            "    5.2 Instanciate Children Node object: %s=%s(%s)",
+                            attr,
+                            cls,
+                            log_payload(value),
+                        )
+                        log.info(" ")
+                    child = prebuilt.get(index)
+                    if child is None and batched:
+                        specs = self.parallel_specs(node, start=index, hooks=True)
+                        children = yield BUILD_BATCH, [
+                            (
+                                spec[1],
+                                {
+                                    "parent": node,
+                                    "ident": spec[2],
+                                    "payload": spec[3],
+                                    "key": spec[4],
+                                },
+                            )
+                            for spec in specs
+                        ]
+                        prebuilt = {
+                            spec[0]: child for spec, child in zip(specs, children)
+                        }
+                        child = prebuilt.get(index)
+                    if child is None:
+                        child = yield cls, {
+                            "parent": node,
+                            "ident": item_def.ident,
+                            "payload": value,
+                            "key": attr,
+                        }
+
+                    log_msg = "Instanciated Children Node object: %s=%s(%s)"
+                    log_args = (attr, cls, log_payload(value)) if info else None
                     # Update parsed conf
                     if attr:
                         node.add_child(attr, child)
+                        hidden.update((key, attr))
                     value = child.serialize(mode="parsed")
 
                 else:
                     if not value:
-                        log_msg = f"Instanciate value: empty object: {attr}={cls}()"
+                        log_msg = "Instanciate value: empty object: %s=%s()"
+                        log_args = (attr, cls)
                         value = cls()
                     elif isinstance(value, cls):
-                        log_msg = f"Instanciate value: cast value: {attr}={cls}({truncate(value, max=TRUNCATE)})"
+                        log_msg = "Instanciate value: cast value: %s=%s(%s)"
+                        log_args = (attr, cls, log_payload(value)) if info else None
                         value = cls(value)
                     else:
-                        log_msg = f"Instanciate value: raw class: {attr}={cls}()"
+                        log_msg = "Instanciate value: raw class: %s=%s()"
+                        log_args = (attr, cls)
                         try:
                             value = cls(value)
                         except Exception as err:
-                            self._node_log.critical(
-                                f"{log_msg}\nType mismatch between for {self}: {cls} and {truncate(value, max=TRUNCATE)}."
+                            log.critical(
+                                log_msg + "\nType mismatch between for %s: %s and %s.",
+                                attr,
+                                cls,
+                                self,
+                                cls,
+                                LazyLog(value, max=TRUNCATE),
                             )
                             assert False, f"Set correctly the exception: {err.__class__}"
                             raise NotExpectedType(err) from err
 
             else:
                 # Forward value
-                log_msg = f"Instanciate direct assignment: {attr}={value}"
+                log_msg = "Instanciate direct assignment: %s=%s"
+                log_args = (attr, log_payload(value)) if info else None
                 # value = value
 
-            if log_msg:
-                self._node_log.info(log_prefix + "3 " + log_msg)
+            if info and log_msg:
+                log.info("    5.3 " + log_msg, *log_args)
 
             # Patch original configuration
             # pylint: disable=protected-access
@@ -835,16 +1862,108 @@ class NodeDictItemManager:
 
             if hook:
                 fun = getattr(node, hook)
-                self._node_log.debug(log_prefix + f"3 Execute hook: {hook}, {fun}")
-                fun()
+                if info:
+                    log.debug("    5.3 Execute hook: %s, %s", hook, fun)
+                result = fun()
+                if inspect.isawaitable(result):
+                    yield BUILD_AWAIT, result
+
+    def parallel_specs(self, node, start=0, hooks=False):
+        """Return children nodes to create, for parallel builds
+
+        Payloads are read like in build_it(), but before any item hook is run.
+        Only items from start index are returned, and with hooks, up to the
+        first item having a hook. Returns (index, cls, ident, payload, attr)
+        tuples.
+        """
+
+        parsed = node._node_conf_parsed
+        hidden = set()
+        result = []
+        for index, item_def in enumerate(self.data):
+
+            key = item_def.key
+            attr = item_def.attr
+            value = parsed.get(key) if key and key not in hidden else None
+            if not item_def.is_node or (
+                not value and item_def.action in ("unset", "drop")
+            ):
+                continue
+
+            if attr:
+                hidden.update((key, attr))
+            if index >= start and not (attr and node._node_lazy):
+                result.append((index, item_def.cls, item_def.ident, value, attr))
+                if hooks and item_def.hook:
+                    break
+
+        return result
+
+    def build_child(self, node, item_def, value):
+        "Create a deferred children node, register it and run its hook"
+
+        attr = item_def.attr
+        child = item_def.cls(parent=node, ident=item_def.ident, payload=value, key=attr)
+        node.add_child(attr, child)
+
+        node._node_conf_parsed[attr] = child.serialize(mode="parsed")
+
+        if item_def.hook:
+            getattr(node, item_def.hook)()
+
+        return child
+
+
+# Types of defaults values which can be shared between instances
+_immutable_types = frozenset(
+    (str, int, float, bool, bytes, complex, type(None), frozenset)
+)
+
+# Mutable keys of conf_default dicts, by dict identity
+_mutable_defaults = {}
+
+
+def get_mutable_defaults(conf_default):
+    """Return conf_default keys holding mutable values
+
+    Other values are shared read-only by all instances. Changes made in place
+    to conf_default after its first use are not seen.
+    """
+
+    cached = _mutable_defaults.get(id(conf_default))
+    if cached is not None and cached[0] is conf_default:
+        return cached[1]
+
+    keys = tuple(
+        key for key, val in conf_default.items() if type(val) not in _immutable_types
+    )
+    _mutable_defaults[id(conf_default)] = (conf_default, keys)
+    return keys
+
+
+def copy_default(value):
+    """Return a copy of a mutable default value
+
+    Faster than deepcopy on json like data, other types are deep copied.
+    """
+
+    cls = type(value)
+    if cls is dict:
+        return {key: copy_default(val) for key, val in value.items()}
+    if cls is list:
+        return [copy_default(val) for val in value]
+    if cls in _immutable_types:
+        return value
+    return copy.deepcopy(value)
 
 
 class NodeDict(NodeVal):
     "Node Dict container"
 
+    __slots__ = ("_node_conf_struct", "_node_pending_")
     _nodes = {}
-    _node_conf_struct = None
     _node_conf_parsed = {}
+    _node_pending = ClassDefault(None, member="_node_pending_")
     _node_kind = "Dict"
 
     # TODO: https://www.pythonlikeyoumeanit.com/Module4_OOP/Special_Methods.html
@@ -858,8 +1977,19 @@ class NodeDict(NodeVal):
     # Overrides
     # -------------------
 
+    def _node_child(self, seg):
+        "Return the children node of a key segment, build it if pending"
+        pending = self._node_pending
+        if pending and seg in pending:
+            return self._node_lazy_build(seg)
+        return (self._nodes or {}).get(seg)
+
+    @read_locked
     def get_children(self, lvl=0, explain=False, leaves=False):
         "Return NodeDict childs"
+        if self._node_pending:
+            self._node_lazy_build()
+
         result = {}
         for name, child in self._nodes.items():
             if isinstance(child, NodeVal):
@@ -884,11 +2014,21 @@ class NodeDict(NodeVal):
             }
         return result
 
+    @read_locked
     def get_value(self, lvl=0, explain=False):
         "Return NodeDict value"
 
+        # Full depth values are cached until the node or its children change
+        cache = lvl < 0 and VALUE_CACHE
+        if cache and self._node_value is not NO_VALUE:
+            return self._node_value
+
+        if lvl != 0 and self._node_pending:
+            self._node_lazy_build()
+
         payload = dict(self._node_conf_parsed)
         children = self._nodes
+        pending = self._node_pending or ()
 
         for item_def in self._node_conf_struct:
 
@@ -896,7 +2036,7 @@ class NodeDict(NodeVal):
             attr = item_def.attr
             child = children.get(attr)
 
-            if isinstance(child, NodeVal):
+            if isinstance(child, NodeVal) or attr in pending:
                 if lvl == 0:
                     if key in payload:
                         del payload[key]
@@ -905,6 +2045,8 @@ class NodeDict(NodeVal):
                 else:
                     payload[attr] = child.get_value(lvl=lvl - 1)
 
+        if cache:
+            self._node_cache_value(payload, children.values())
         return payload
 
     def _node_conf_defaults(self, payload):
@@ -921,9 +2063,13 @@ class NodeDict(NodeVal):
                 f"A dict was expected for {self}/conf_default, got: {conf_default}"
             )
 
-        # Update payload
-        result = copy.deepcopy(conf_default)
+        # Update payload, copy on write defaults: immutable defaults values are
+        # shared, mutable ones are only copied when not set by the payload
+        result = conf_default.copy()
         result.update(payload)
+        for key in get_mutable_defaults(conf_default):
+            if key not in payload:
+                result[key] = copy_default(conf_default[key])
         payload = result
 
         # Init item constructor from current payload
@@ -937,8 +2083,20 @@ class NodeDict(NodeVal):
 
         return payload
 
+    def _node_conf_state(self):
+        "Return children plan, for dedupe mode"
+        return self._node_conf_struct
+
+    def _node_conf_restore(self, state):
+        "Restore children plan, for dedupe mode"
+        self._node_conf_struct = state
+
     def _node_conf_build(self):
-        "For NodeDict"
+        "Build children synchronously, for NodeDict"
+        build_recursive(self._node_conf_steps())
+
+    def _node_conf_steps(self):
+        "Yield children to create, for NodeDict"
 
         payload = self._node_conf_parsed
 
@@ -950,7 +2108,41 @@ class NodeDict(NodeVal):
             )
 
         self._nodes = {}
-        self._node_conf_struct.build_it(self)
+        self._node_pending = {} if self._node_lazy else None
+        yield from self._node_conf_struct.build_it(self)
+
+    def _node_lazy_build(self, attr=None):
+        "Create pending lazy children, or only attr, and return it"
+
+        lock = self._node_lock
+        if lock is None:
+            return self._node_lazy_create(attr)
+
+        # Concurrent readers may create the same children
+        with lock.building():
+            if attr is not None and attr not in self._node_pending:
+                return self._nodes[attr]
+            return self._node_lazy_create(attr)
+
+    def _node_lazy_create(self, attr=None):
+        "Create pending lazy children, or only attr, and return it"
+
+        pending = self._node_pending
+        attrs = list(pending) if attr is None else [attr]
+
+        child = None
+        for name in attrs:
+            item_def, value = pending[name]
+            child = self._node_conf_struct.build_child(self, item_def, value)
+            del pending[name]
+
+        # Keep children ordered as if they were built during deserialize
+        if not pending:
+            nodes = self._nodes
+            order = [item.attr for item in self._node_conf_struct if item.attr in nodes]
+            self._nodes = {**{name: nodes[name] for name in order}, **nodes}
+
+        return child
 
     def add_child(self, ident, obj):
         "Add a child node"
@@ -960,7 +2152,24 @@ class NodeDict(NodeVal):
             obj, NodeVal
         ), f"Cannot add non child object to {self}: got {obj}"
 
+        old = self._nodes.get(ident)
         self._nodes[ident] = obj
+        self._node_index_replace(ident, old, obj)
+        self._node_dirty()
+
+    def _node_index_replace(self, key, old, new):
+        "Update the tree index when the key child is replaced"
+
+        index = self._node_root._node_index
+        if index is None:
+            return
+        if not isinstance(old, NodeVal):
+            old = None
+        if not isinstance(new, NodeVal):
+            new = None
+        elif new not in index:
+            new._node_key = key
+        index.replace(old, new)
 
 
 # NodeMap
@@ -970,12 +2179,14 @@ class NodeDict(NodeVal):
 class NodeMap(NodeDict):
     "A nodeDict accessible via its attributes"
 
+    __slots__ = ()
+
     def add_child(self, ident, obj):
         "Add a child node"
 
         # pylint: disable=super-with-arguments
         super(NodeMap, self).add_child(ident, obj)
-        setattr(self, ident, obj)
+        self._node_setattr(ident, obj)
         #print ("SET ATTR", self, ident, obj)
 
     def __getattr__(self, key):
@@ -985,10 +2196,27 @@ class NodeMap(NodeDict):
         # Linter reports an issue when accessing attributes
         # not defined at the class/instance level. How to to fix this?
 
+        # Unset slots of the object itself, can't be config nodes
+        if key in _base_slots:
+            raise AttributeError(key)
+
+        lock = self._node_lock
+        if lock is None:
+            return self._node_getattr(key)
+        with lock.read():
+            return self._node_getattr(key)
+
+    def _node_getattr(self, key):
+        "Fetch attribute from config nodes"
+
         if key in self._nodes:
             # print (f"Get value: {key} for {id(self)} from _nodes")
             return self._nodes[key]
 
+        pending = self._node_pending
+        if pending and key in pending:
+            return self._node_lazy_build(key)
+
         if key in self._node_conf_parsed:
             # print (f"Get value: {key} for {id(self)} from _conf_parsed")
             return self._node_conf_parsed[key]
@@ -1004,14 +2232,40 @@ class NodeMap(NodeDict):
 
     def __setattr__(self, key, value):
 
+        if key in _internal_attrs:
+            # Internal attributes are never config nodes
+            # pylint: disable=super-with-arguments
+            super(NodeMap, self).__setattr__(key, value)
+            return
+
+        lock = self._node_lock
+        if lock is None:
+            self._node_setattr(key, value)
+        else:
+            with lock.write():
+                self._node_setattr(key, value)
+
+    def _node_setattr(self, key, value):
+        "Set attribute in config nodes"
+
         if key in self._nodes:
             # Set attribute if in _nodes
             # print (f"Set node value: {key}={value} for {self}")
+            old = self._nodes[key]
             self._nodes[key] = value
+            self._node_index_replace(key, old, value)
+            self._node_dirty()
             # self.__dict__[key] = value
+        elif self._node_pending and key in self._node_pending:
+            # Replace a lazy children before its creation
+            del self._node_pending[key]
+            self._nodes[key] = value
+            self._node_index_replace(key, None, value)
+            self._node_dirty()
         elif key in self._node_conf_parsed:
             # print (f"Set conf value: {key}={value} for {self}")
             self._node_conf_parsed[key] = value
+            self._node_dirty()
         else:
             # or just set regular attribute
             # print (f"Set attr value: {key}={value} for {self}")
@@ -1019,6 +2273,17 @@ class NodeMap(NodeDict):
             super(NodeMap, self).__setattr__(key, value)
 
 
+_base_slots = frozenset(
+    name for cls in NodeMap.__mro__ for name in getattr(cls, "__slots__", ())
+)
+_internal_attrs = frozenset(
+    name
+    for cls in NodeMap.__mro__
+    for name, attr in vars(cls).items()
+    if name.startswith("_node") and hasattr(attr, "__set__")
+)
+
+
 # NodeMapEnv
 # =====================================
 
@@ -1058,6 +2323,8 @@ def expand_envar_syntax(payload, cls):
 class NodeMapEnv(NodeMap):
     "Like a NodeMap, but fetch value from env"
 
+    __slots__ = ()
+
     conf_env_prefix = None
 
     def _node_conf_defaults(self, payload):
@@ -1091,9 +2358,9 @@ class NodeMapEnv(NodeMap):
         result = os.getenv(name)
 
         if result:
-            self._node_log.info(f"    3.2 Fetch value from env: {name}={result}")
+            self._node_log.info("    3.2 Fetch value from env: %s=%s", name, result)
         else:
-            self._node_log.debug(f"    3.2 Skip value from env: {name}")
+            self._node_log.debug("    3.2 Skip value from env: %s", name)
 
         return result
 
@@ -1123,11 +2390,19 @@ class NodeAuto:
     the associated classe upon is source object type.
     """
 
-    def __init__(self, *args, ident=None, payload=None, autoconf=-1, **kwargs):
+    def __new__(cls, *args, ident=None, payload=None, autoconf=-1, **kwargs):
 
         # Map json object to Node class
-        self.__class__ = map_node_class(payload)
+        node_cls = map_node_class(payload)
 
         # Forward to class
-        # pylint: disable=non-parent-init-called
-        self.__init__(*args, ident=ident, payload=payload, autoconf=autoconf, **kwargs)
+        return node_cls(*args, ident=ident, payload=payload, autoconf=autoconf, **kwargs)
+
+    @classmethod
+    async def abuild(cls, *args, ident=None, payload=None, autoconf=-1, **kwargs):
+        "Create a node tree from an event loop, see NodeVal.abuild()"
+
+        node_cls = map_node_class(payload)
+        return await node_cls.abuild(
+            *args, ident=ident, payload=payload, autoconf=autoconf, **kwargs
+        )
@@ -0,0 +1,370 @@
+"""
+Config patches
+
+Apply JSON Patch (RFC 6902) operations, or dotted paths set/delete, on built
+node trees. Paths address raw payloads keys. Only the deepest node holding
+the changed value is rebuilt, then its ancestors payloads are validated and
+updated.
+"""
+
+import re
+import copy
+
+from cafram.base import InvalidSyntax, PatchError
+
+# Paths
+# =====================================
+
+
+def parse_path(path):
+    "Return path segments of a json pointer (/a/0) or a dotted path (a.0, a[0])"
+
+    if isinstance(path, (list, tuple)):
+        return [str(seg) for seg in path]
+    if not isinstance(path, str):
+        raise InvalidSyntax(f"A string path was expected, got: {path}")
+
+    if path == "":
+        return []
+    if path.startswith("/"):
+        return [
+            seg.replace("~1", "/").replace("~0", "~") for seg in path[1:].split("/")
+        ]
+    if "[" in path:
+        path = re.sub(r"\[(\d+)\]", r".\1", path)
+        if path.startswith("."):
+            path = path[1:]
+    return path.split(".")
+
+
+def _list_index(payload, seg, insert=False):
+    "Return list index of path segment"
+
+    size = len(payload)
+    if insert and seg == "-":
+        return size
+    try:
+        index = int(seg)
+    except ValueError as err:
+        raise PatchError(f"Invalid list index: {seg}") from err
+
+    if index < 0 or index > size or (index == size and not insert):
+        raise PatchError(f"List index out of range: {seg}")
+    return index
+
+
+def get_path(payload, segments):
+    "Return value at path segments in payload"
+
+    for seg in segments:
+        if isinstance(payload, dict):
+            if seg not in payload:
+                raise PatchError(f"Missing key in path: {seg}")
+            payload = payload[seg]
+        elif isinstance(payload, list):
+            payload = payload[_list_index(payload, seg)]
+        else:
+            raise PatchError(f"Can't walk into {type(payload).__name__}: {seg}")
+    return payload
+
+
+def with_path(payload, segments, action, value=None):
+    """Return a copy of payload with operation applied at path segments
+
+    Only containers on the path are copied, payload is not modified.
+    Operations are: add, remove, replace and set (add or replace).
+    """
+
+    if not segments:
+        if action == "remove":
+            raise PatchError("Can't remove the whole payload")
+        return value
+
+    seg, rest = segments[0], segments[1:]
+    if isinstance(payload, dict):
+        return _with_dict_path(payload, seg, rest, action, value)
+    if isinstance(payload, list):
+        return _with_list_path(payload, seg, rest, action, value)
+    raise PatchError(f"Can't walk into {type(payload).__name__}: {seg}")
+
+
+def _with_dict_path(payload, seg, rest, action, value):
+    "Return a copy of a dict payload with operation applied at key seg"
+
+    result = dict(payload)
+    if rest or action in ("remove", "replace"):
+        if seg not in result:
+            raise PatchError(f"Missing key in path: {seg}")
+    if rest:
+        result[seg] = with_path(result[seg], rest, action, value)
+    elif action == "remove":
+        del result[seg]
+    else:
+        result[seg] = value
+    return result
+
+
+def _with_list_path(payload, seg, rest, action, value):
+    "Return a copy of a list payload with operation applied at index seg"
+
+    result = list(payload)
+    index = _list_index(result, seg, insert=action == "add" and not rest)
+    if rest:
+        result[index] = with_path(result[index], rest, action, value)
+    elif action == "remove":
+        del result[index]
+    elif action == "add":
+        result.insert(index, value)
+    else:
+        result[index] = value
+    return result
+
+
+# Nodes
+# =====================================
+
+# pylint: disable=protected-access
+
+
+def _get_child(node, seg):
+    "Return children node of a payload key, if built"
+
+    if node._node_kind == "Dict":
+        for item_def in node._node_conf_struct:
+            if item_def.key == seg:
+                attr = item_def.attr
+                pending = node._node_pending
+                if pending and attr in pending:
+                    return node._node_lazy_build(attr)
+                return node._nodes.get(attr)
+        return None
+
+    if node._node_kind == "List":
+        nodes = node._nodes
+        if nodes:
+            try:
+                return nodes[_list_index(nodes, seg)]
+            except PatchError:
+                return None
+
+    return None
+
+
+def _list_location(parent, child):
+    "Return index of a children node in a list parent, None if not found"
+
+    # Children know their index in parent
+    index = child._node_key
+    if isinstance(index, int):
+        if parent._node_items is not None:
+            found = parent._node_items.cache.get(index)
+        else:
+            nodes = parent._nodes or ()
+            found = nodes[index] if index < len(nodes) else None
+        if found is child:
+            return index
+
+    if parent._node_items is not None:
+        nodes = parent._node_items.cache.items()
+    else:
+        nodes = enumerate(parent._nodes)
+    for index, node in nodes:
+        if node is child:
+            return index
+    return None
+
+
+def _dict_location(parent, child):
+    "Return item definition of a children node in a dict parent, if found"
+
+    # Children know their attribute in parent
+    attr = child._node_key
+    if parent._nodes.get(attr) is child:
+        for item_def in parent._node_conf_struct:
+            if item_def.attr == attr:
+                return item_def
+
+    for item_def in parent._node_conf_struct:
+        if parent._nodes.get(item_def.attr) is child:
+            return item_def
+    return None
+
+
+def _child_location(parent, child):
+    "Return payload key, attr and item hook of a children node in parent"
+
+    if parent._node_kind == "List":
+        index = _list_location(parent, child)
+        if index is not None:
+            return index, index, None
+
+    elif parent._node_kind == "Dict":
+        item_def = _dict_location(parent, child)
+        if item_def is not None:
+            return item_def.key, item_def.attr, item_def.hook
+
+    raise PatchError(f"Can't find {child} in its parent {parent}")
+
+
+def _update_parents(node):
+    """Update ancestors payloads after node has been rebuilt
+
+    Ancestors new raw payloads are validated first, nothing is changed when
+    one of them is invalid.
+    """
+
+    # Validate ancestors new raw payloads
+    updates = []
+    raw = node._node_conf_raw
+    child = node
+    parent = node._node_parent
+    while parent is not child:
+        key, attr, hook = _child_location(parent, child)
+        if parent._node_kind == "List":
+            parent_raw = list(parent._node_conf_raw or [])
+        else:
+            parent_raw = dict(parent._node_conf_raw or {})
+        parent_raw[key] = raw
+        raw = parent_raw
+        parent._node_conf_validate(raw)
+        updates.append((parent, child, attr, hook, raw))
+
+        child = parent
+        parent = parent._node_parent
+
+    # Update ancestors, from the closest one
+    for parent, child, attr, hook, raw in updates:
+        if parent._node_kind == "List":
+            parsed = list(parent._node_conf_parsed)
+            parsed[attr] = child._node_conf_raw
+        else:
+            parsed = dict(parent._node_conf_parsed)
+            parsed[attr] = child.serialize(mode="parsed")
+
+        parent._node_conf_raw = raw
+        parent._node_conf_parsed = parsed
+
+        # Children item hook is executed again
+        if hook and child is node:
+            getattr(parent, hook)()
+
+
+def patch_node(node, action, path, value=None):
+    """Apply an operation at path on a node tree
+
+    The deepest built node holding path is deserialized again with its
+    patched raw payload, then ancestors raw payloads are validated and
+    ancestors payloads are updated. Ancestors are not rebuilt, and their hooks
+    are not executed again, except the conf_children item hook of the rebuilt
+    node. On errors, the rebuilt node is restored from its previous payload.
+    """
+
+    if action not in ("add", "remove", "replace", "set"):
+        raise PatchError(f"Unsupported patch operation: {action}")
+    segments = parse_path(path)
+
+    # Find deepest node holding path, the last segment is only followed when
+    # the operation replaces the children node payload
+    while segments:
+        if len(segments) == 1 and not (
+            action in ("replace", "set")
+            or (action == "add" and node._node_kind == "Dict")
+        ):
+            break
+        child = _get_child(node, segments[0])
+        if child is None:
+            break
+        node = child
+        segments = segments[1:]
+
+    old_payload = node._node_conf_raw
+    payload = old_payload
+    if payload is None and segments:
+        payload = [] if node._node_kind == "List" else {}
+    payload = with_path(payload, segments, action, value)
+
+    try:
+        node.deserialize(payload)
+        _update_parents(node)
+    except Exception:
+        node.deserialize(old_payload)
+        raise
+    node._node_dirty()
+
+    return node
+
+
+def _patch_value(node, operation):
+    "Apply an add or replace JSON Patch operation"
+
+    if "value" not in operation:
+        raise PatchError(f"Missing value in patch operation: {operation}")
+    patch_node(node, operation["op"], operation["path"], operation["value"])
+
+
+def _patch_remove(node, operation):
+    "Apply a remove JSON Patch operation"
+
+    patch_node(node, "remove", operation["path"])
+
+
+def _patch_test(node, operation):
+    "Apply a test JSON Patch operation"
+
+    path = operation["path"]
+    value = get_path(node._node_conf_raw, parse_path(path))
+    if value != operation.get("value"):
+        raise PatchError(f"Test failed on '{path}': {value}")
+
+
+def _patch_from(node, operation):
+    "Apply a move or copy JSON Patch operation"
+
+    source = operation.get("from")
+    if source is None:
+        raise PatchError(f"Missing from in patch operation: {operation}")
+    value = copy.deepcopy(get_path(node._node_conf_raw, parse_path(source)))
+    if operation["op"] == "move":
+        patch_node(node, "remove", source)
+    patch_node(node, "add", operation["path"], value)
+
+
+PATCH_OPERATIONS = {
+    "add": _patch_value,
+    "replace": _patch_value,
+    "remove": _patch_remove,
+    "test": _patch_test,
+    "move": _patch_from,
+    "copy": _patch_from,
+}
+
+
+def _apply_operation(node, operation):
+    "Apply one JSON Patch operation on a node tree"
+
+    if operation.get("path") is None:
+        raise PatchError(f"Missing path in patch operation: {operation}")
+    action = operation.get("op")
+    handler = PATCH_OPERATIONS.get(action)
+    if handler is None:
+        raise PatchError(f"Unsupported patch operation: {action}")
+    handler(node, operation)
+
+
+def apply_patch(node, patch):
+    """Apply a JSON Patch (RFC 6902) on a node tree
+
+    Operations are applied in order. When an operation fails, the node is
+    restored from its raw payload before the patch.
+    """
+
+    snapshot = node._node_conf_raw
+    try:
+        for operation in patch:
+            _apply_operation(node, operation)
+    except Exception:
+        if node._node_conf_raw is not snapshot:
+            patch_node(node, "set", "", snapshot)
+        raise
+
+    return node
@@ -0,0 +1,303 @@
+"""
+Nodes queries
+
+Select nodes of a tree with a small path language, a subset of JSONPath and
+globs over children attributes names and list indexes:
+
+    files.*.filters     filters of all files children
+    files[0]            first item of files list
+    files[*]            all items of files list
+    **.filters          filters nodes at any depth, also $..filters
+    **                  all nodes
+    rules[?enabled=true] rules items which enabled field is true
+
+Names may contain * and ? globs. Filters values are parsed as json, or used
+as strings. Trees built with an index (conf_index) answer queries selecting
+nodes by class or by name at any depth without walking the tree, unless
+they have lazy nodes.
+"""
+
+import re
+import json
+import fnmatch
+
+from cafram.base import InvalidSyntax
+from cafram.memory import get_nodes
+
+# pylint: disable=protected-access
+
+_tokens = re.compile(
+    r"(?P<desc>\.\.)"
+    r"|(?P<sep>\.)"
+    r"|\[(?P<index>\d+|\*)\]"
+    r"|\[\?(?P<field>[^=\]]+)=(?P<value>[^\]]*)\]"
+    r"|(?P<name>[^.\[\]]+)"
+)
+
+# Nodes index
+# =====================================
+
+
+class NodeIndex:
+    """Nodes of a tree by class and by name, in creation order
+
+    Lists items are not indexed by name, as their names are their indexes.
+    Nodes are added on creation, and removed when their parent is built
+    again, when they are replaced or when they are evicted from lazy lists
+    caches.
+    """
+
+    def __init__(self):
+        self.by_class = {}
+        self.by_key = {}
+        self.lazy = False
+
+    def add(self, node):
+        "Register a node"
+        if node._node_lazy:
+            self.lazy = True
+        self.by_class.setdefault(type(node), {})[id(node)] = node
+        key = node._node_key
+        if isinstance(key, str):
+            self.by_key.setdefault(key, {})[id(node)] = node
+
+    def discard(self, node):
+        "Unregister a node"
+        nodes = self.by_class.get(type(node))
+        if nodes is not None:
+            nodes.pop(id(node), None)
+        nodes = self.by_key.get(node._node_key)
+        if nodes is not None:
+            nodes.pop(id(node), None)
+
+    def __contains__(self, node):
+        nodes = self.by_class.get(type(node))
+        return nodes is not None and id(node) in nodes
+
+    def replace(self, old, new):
+        "Unregister old nodes tree and register new nodes tree, both may be None"
+        if old is new:
+            return
+        if old is not None:
+            self.discard(old)
+            self.discard_children(old)
+        if new is not None and new not in self:
+            for node in get_nodes(new):
+                self.add(node)
+
+    def discard_children(self, node):
+        "Unregister built children nodes of node, recursively"
+        for child in get_nodes(node):
+            if child is not node:
+                self.discard(child)
+
+    def get_class(self, cls):
+        "Return nodes instances of cls"
+        result = []
+        for node_cls, nodes in self.by_class.items():
+            if issubclass(node_cls, cls):
+                result.extend(nodes.values())
+        return result
+
+    def get_key(self, pattern):
+        "Return nodes which name matches pattern"
+        if not _is_glob(pattern):
+            return list(self.by_key.get(pattern, {}).values())
+        result = []
+        for key, nodes in self.by_key.items():
+            if fnmatch.fnmatchcase(key, pattern):
+                result.extend(nodes.values())
+        return result
+
+
+# Paths
+# =====================================
+
+
+def _is_glob(pattern):
+    "Return True if pattern contains globs"
+    return "*" in pattern or "?" in pattern
+
+
+def _parse_value(value):
+    "Return filter value"
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value.strip("'")
+
+
+def parse_query(path):
+    """Return query steps of path
+
+    Steps are (desc,), (name, pattern), (index, index or *) and
+    (filter, field, value) tuples.
+    """
+
+    if not isinstance(path, str):
+        raise InvalidSyntax(f"A string query was expected, got: {path}")
+    if path.startswith("$"):
+        path = path[1:]
+
+    steps = []
+    pos = 0
+    while pos < len(path):
+        match = _tokens.match(path, pos)
+        if match is None:
+            raise InvalidSyntax(f"Invalid query at {pos}: {path}")
+        pos = match.end()
+
+        kind = match.lastgroup
+        if kind == "desc":
+            steps.append(("desc",))
+        elif kind == "index":
+            index = match.group("index")
+            steps.append(("index", index if index == "*" else int(index)))
+        elif match.group("field") is not None:
+            field = match.group("field").strip()
+            steps.append(("filter", field, _parse_value(match.group("value"))))
+        elif kind == "name":
+            name = match.group("name")
+            steps.append(("desc",) if name == "**" else ("name", name))
+
+    return steps
+
+
+# Queries
+# =====================================
+
+
+def get_children(node):
+    "Return (name, child) of children nodes, lazy children are created"
+
+    if node._node_kind == "Dict":
+        return list(node.get_children().items())
+    if node._node_kind == "List":
+        return [
+            (str(index), child)
+            for index, child in enumerate(node)
+            if hasattr(child, "_node_kind")
+        ]
+    return []
+
+
+def get_descendants(node):
+    "Return node and all its descendants, in tree order"
+
+    result = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        result.append(node)
+        stack.extend(reversed([child for _, child in get_children(node)]))
+    return result
+
+
+def match_fields(node, where):
+    "Return True if node parsed payload has all where fields values"
+
+    payload = node._node_conf_parsed
+    if not isinstance(payload, dict):
+        return False
+    for field, value in where.items():
+        if field not in payload or payload[field] != value:
+            return False
+    return True
+
+
+def _run_step(nodes, step):
+    "Return nodes selected by a query step"
+
+    kind = step[0]
+    if kind == "desc":
+        return [child for node in nodes for child in get_descendants(node)]
+    if kind == "filter":
+        where = {step[1]: step[2]}
+        return [
+            child
+            for node in nodes
+            for _, child in get_children(node)
+            if match_fields(child, where)
+        ]
+
+    result = []
+    for node in nodes:
+        if kind == "name":
+            result.extend(
+                child
+                for name, child in get_children(node)
+                if fnmatch.fnmatchcase(name, step[1])
+            )
+        elif node._node_kind == "List":
+            index = step[1]
+            if index == "*":
+                result.extend(child for _, child in get_children(node))
+            elif index < len(node) and hasattr(node[index], "_node_kind"):
+                result.append(node[index])
+    return result
+
+
+def _is_descendant(node, parent):
+    "Return True if node is a strict descendant of parent"
+    while node._node_parent is not node:
+        node = node._node_parent
+        if node is parent:
+            return True
+    return False
+
+
+def _run_index(node, steps, cls):
+    "Return nodes selected with the tree index, or None"
+
+    # Lazy children are not indexed until they are created
+    root = node._node_root
+    index = root._node_index
+    if index is None or index.lazy or not steps or steps[0] != ("desc",):
+        return None
+
+    if len(steps) == 1 and cls is not None:
+        result = index.get_class(cls)
+        if node is not root:
+            result = [
+                item for item in result if item is node or _is_descendant(item, node)
+            ]
+        return result
+
+    # Lists items names are digits, patterns which may match them are walked
+    pattern = steps[1][1] if len(steps) == 2 and steps[1][0] == "name" else None
+    if pattern and not pattern[0].isdigit() and pattern[0] not in "*?":
+        result = index.get_key(pattern)
+        if node is not root:
+            result = [item for item in result if _is_descendant(item, node)]
+        return result
+
+    return None
+
+
+def query_nodes(node, path="**", cls=None, where=None):
+    """Return nodes of node tree matching query path
+
+    Nodes can also be selected by class (cls) and by parsed payload fields
+    values (where dict). Walked results are in tree order, indexed results in
+    creation order.
+    """
+
+    steps = parse_query(path)
+    result = _run_index(node, steps, cls)
+    if result is None:
+        result = [node]
+        for step in steps:
+            result = _run_step(result, step)
+
+    seen = set()
+    selected = []
+    for item in result:
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if cls is not None and not isinstance(item, cls):
+            continue
+        if where and not match_fields(item, where):
+            continue
+        selected.append(item)
+    return selected
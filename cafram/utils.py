@@ -11,16 +11,45 @@ import os
 import logging
 import json
 import re
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from io import StringIO
 
 # from pprint import pprint
 # from pathlib import Path
 
 import ruamel.yaml
+from ruamel.yaml.events import (
+    StreamStartEvent,
+    StreamEndEvent,
+    DocumentStartEvent,
+    DocumentEndEvent,
+    MappingStartEvent,
+    MappingEndEvent,
+    SequenceStartEvent,
+    SequenceEndEvent,
+    ScalarEvent,
+)
+from ruamel.yaml.nodes import ScalarNode
+from ruamel.yaml.representer import SafeRepresenter
+from ruamel.yaml.resolver import VersionedResolver
+
+try:
+    from ruamel.yaml.cyaml import CEmitter
+except ImportError:
+    CEmitter = None
+
 import jsonschema
 from jsonschema import Draft202012Validator, validators
 import sh
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # =====================================================================
 # Init
@@ -37,13 +66,145 @@ import sh
 log = logging.getLogger(__name__)
 
 
+class FastRepresenter(SafeRepresenter):
+    "Safe representer of builtin types subclasses, like round trip values"
+
+
+FastRepresenter.add_multi_representer(dict, SafeRepresenter.represent_dict)
+FastRepresenter.add_multi_representer(list, SafeRepresenter.represent_list)
+FastRepresenter.add_multi_representer(str, SafeRepresenter.represent_str)
+FastRepresenter.add_multi_representer(int, SafeRepresenter.represent_int)
+FastRepresenter.add_multi_representer(float, SafeRepresenter.represent_float)
+
+
 # Setup YAML object
-yaml = ruamel.yaml.YAML()
-yaml.version = (1, 1)
-yaml.default_flow_style = False
-# yaml.indent(mapping=3, sequence=2, offset=0)
-yaml.allow_duplicate_keys = True
-yaml.explicit_start = True
+def new_yaml(fast=False):
+    """Return a new YAML object with cafram settings
+
+    Fast YAML objects are safe ones, using the C extension when available.
+    """
+    if fast:
+        instance = ruamel.yaml.YAML(typ="safe", pure=CEmitter is None)
+        instance.Representer = FastRepresenter
+        instance.sort_base_mapping_type_on_output = False
+    else:
+        instance = ruamel.yaml.YAML()
+    instance.version = (1, 1)
+    instance.default_flow_style = False
+    # instance.indent(mapping=3, sequence=2, offset=0)
+    instance.allow_duplicate_keys = True
+    instance.explicit_start = True
+    return instance
+
+
+# YAML objects are not thread safe, helpers use one YAML object per thread
+yaml = new_yaml()
+_yaml_local = threading.local()
+
+
+def get_yaml(fast=False):
+    "Return the YAML object of the current thread"
+    attr = "fast_yaml" if fast else "yaml"
+    instance = getattr(_yaml_local, attr, None)
+    if instance is None:
+        instance = new_yaml(fast=fast)
+        setattr(_yaml_local, attr, instance)
+    return instance
+
+
+if CEmitter is not None:
+
+    class FastDumper(CEmitter, FastRepresenter, VersionedResolver):
+        """Safe YAML dumper using the C emitter
+
+        ruamel.yaml C dumpers resolve implicit tags with YAML 1.2 rules,
+        this one quotes strings like YAML 1.1 booleans for versioned output.
+        """
+
+        def __init__(self, stream, instance):
+            CEmitter.__init__(
+                self,
+                stream,
+                allow_unicode=instance.allow_unicode,
+                explicit_start=instance.explicit_start,
+                version=instance.version,
+            )
+            self._emitter = self._serializer = self._representer = self
+            FastRepresenter.__init__(
+                self, default_flow_style=instance.default_flow_style
+            )
+            self.sort_base_mapping_type_on_output = False
+            VersionedResolver.__init__(self, version=instance.version)
+
+
+def dump_yaml(obj, stream, fast=False):
+    "Write obj as YAML to stream, fast dumps use the C emitter when available"
+
+    instance = get_yaml(fast=fast)
+    if not fast or CEmitter is None:
+        instance.dump(obj, stream)
+        return
+
+    dumper = FastDumper(stream, instance)
+    try:
+        dumper.open()
+        dumper.represent(obj)
+        dumper.close()
+    finally:
+        dumper.dispose()
+
+
+# =====================================================================
+# JSON backend
+# =====================================================================
+
+# JSON helpers use the json module, and orjson in fast mode when installed.
+# Fast mode outputs may differ from the json module ones: compact outputs have
+# no spaces, NaN and Infinity are null, floats exponents are shorter and enums
+# are written with their values. Datetime, enum and UUID keys are written as
+# strings instead of raising TypeError. Integers over 64 bits are read as
+# floats.
+
+
+def json_loads(string, fast=False):
+    "Parse a JSON string, like json.loads(), fast mode uses orjson"
+
+    if fast and orjson is not None:
+        # pylint: disable=no-member
+        try:
+            return orjson.loads(string)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity or lone surrogates are only read by json module
+            pass
+    return json.loads(string)
+
+
+def json_dumps(obj, indent=None, default=None, fast=False):
+    """Return obj as a JSON string, like json.dumps()
+
+    indent is None or 2. Fast mode uses orjson, outputs with non ASCII
+    characters, integers over 64 bits or keys orjson can't dump use json
+    module.
+    """
+
+    if fast and orjson is not None and indent in (None, 2):
+        # pylint: disable=no-member
+        option = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            output = orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # Integers over 64 bits, unsupported keys or too deep documents
+            output = None
+        # Non ASCII characters are escaped by json module
+        if output is not None and output.isascii():
+            return output.decode()
+    return json.dumps(obj, indent=indent, default=default)
 
 
 # =====================================================================
@@ -136,6 +297,66 @@ class MultiLineFormatter(logging.Formatter):
         return head + "".join(indent + line for line in trailing)
 
 
+class IndentLoggerAdapter(logging.LoggerAdapter):
+    "LoggerAdapter to manage logging indentation"
+
+    def process(self, msg, kwargs):
+        indent = kwargs.pop("indent", None)
+        if indent is None:
+            indent = "| " * self.extra["lvl"]
+        return f"{indent}{msg}", kwargs
+
+    def __getattr__(self, name):
+        "Forward unknown attributes such as custom levels in logger"
+        if name == "logger" or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.logger, name)
+
+
+# Loggers and indented adapters are shared by all objects
+_loggers = {}
+_indent_loggers = {}
+
+
+def get_cached_logger(name):
+    "Return logger by name, avoid logging.getLogger() lock on hot paths"
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = logging.getLogger(name)
+    return logger
+
+
+def get_indent_logger(lvl=0, name="cafram"):
+    "Return the shared indented logger adapter for a given level"
+    key = (name, lvl)
+    adapter = _indent_loggers.get(key)
+    if adapter is None:
+        adapter = IndentLoggerAdapter(get_cached_logger(name), {"lvl": lvl})
+        _indent_loggers[key] = adapter
+    return adapter
+
+
+class LazyLog:  # pylint: disable=too-few-public-methods
+    """Defer payload string conversion until a log record is emitted
+
+    Intended to be passed as a %-style argument to loggers, so nothing is
+    computed when the log level is disabled. When max is None, only the
+    payload type is shown and the payload is never stringified.
+    """
+
+    __slots__ = ("payload", "max")
+
+    # pylint: disable=redefined-builtin
+    def __init__(self, payload, max=-1):
+        self.payload = payload
+        self.max = max
+
+    def __str__(self):
+        if self.max is None:
+            return f"<{type(self.payload).__name__}>"
+        return truncate(self.payload, max=self.max)
+
+
 def get_logger(logger_name=None, create_file=False, verbose=None, sformat='default', tformat='default'):
     """Create CmdApp logger"""
 
@@ -248,22 +469,19 @@ def first(array):
     return result
 
 
-# TODO: add tests
-def from_yaml(string):
-    "Transform YAML string to python dict"
-    return yaml.load(string)
+def from_yaml(string, fast=False):
+    "Transform YAML string to python dict, fast mode is a safe load"
+    return get_yaml(fast=fast).load(string)
 
 
-# TODO: add tests
-def to_yaml(obj, headers=False):
-    "Transform obj to YAML"
-    options = {}
+def to_yaml(obj, headers=False, fast=False):
+    "Transform obj to YAML, fast mode is a safe dump"
     string_stream = StringIO()
 
     if isinstance(obj, str):
-        obj = json.loads(obj)
+        obj = json_loads(obj, fast=fast)
 
-    yaml.dump(obj, string_stream, **options)
+    dump_yaml(obj, string_stream, fast=fast)
     output_str = string_stream.getvalue()
     string_stream.close()
     if not headers:
@@ -271,50 +489,36 @@ def to_yaml(obj, headers=False):
     return output_str
 
 
-# TODO: add tests
-def to_json(obj, nice=True):
-    "Transform JSON string to python dict"
-    if nice:
-        return json.dumps(obj, indent=2)
-    return json.dumps(obj)
+def to_json(obj, nice=True, fast=False):
+    "Transform python dict to JSON string, fast mode uses orjson"
+    return json_dumps(obj, indent=2 if nice else None, fast=fast)
 
 
-# TODO: add tests
-def from_json(string):
-    "Transform JSON string to python dict"
-    return json.loads(string)
+def from_json(string, fast=False):
+    "Transform JSON string to python dict, fast mode uses orjson"
+    return json_loads(string, fast=fast)
 
 
-# TODO: add tests
-def to_dict(obj):
+def to_dict(obj, fast=False):
     """Transform JSON obj/string to python dict
 
     Useful to transofmr nested dicts as well"""
     if not isinstance(obj, str):
-        obj = json.dumps(obj)
-    return json.loads(obj)
+        obj = json_dumps(obj, fast=fast)
+    return json_loads(obj, fast=fast)
 
 
-def serialize(obj, fmt="json"):
+def serialize(obj, fmt="json", fast=False):
     "Serialize anything, output json like compatible (destructive)"
 
-    # pylint: disable=unnecessary-lambda
-    obj = json.dumps(obj, default=lambda o: str(o), indent=2)
-
     if fmt in ["yaml", "yml"]:
-        # Serialize object in json first
-        obj = json.loads(obj)
-
-        # Convert json to yaml
+        # Objects are represented as YAML directly, without JSON round trip
         string_stream = io.StringIO()
-        yaml.dump(obj, string_stream)
-        output_str = string_stream.getvalue()
-        string_stream.close()
-
-        # Remove 2 first lines of output
-        obj = output_str.split("\n", 2)[2]
+        emit_yaml(iter_events(obj, json_keys=True), string_stream)
+        return string_stream.getvalue()
 
-    return obj
+    # pylint: disable=unnecessary-lambda
+    return json_dumps(obj, indent=2, default=lambda o: str(o), fast=fast)
 
 
 def duplicates(_list):
@@ -338,6 +542,12 @@ def read_file(file):
         return "".join(_file.readlines())
 
 
+def read_yaml(file, fast=False):
+    "Read YAML file content, fast mode is a safe load"
+    with open(file, encoding="utf-8") as _file:
+        return get_yaml(fast=fast).load(_file)
+
+
 def write_file(file, content):
     "Write content to file"
 
@@ -358,6 +568,139 @@ def flatten(array):
     return array[:1] + flatten(array[1:])
 
 
+# =====================================================================
+# Values events
+# =====================================================================
+
+# Values events kinds
+MAP = "map"
+SEQ = "seq"
+KEY = "key"
+END = "end"
+SCALAR = "scalar"
+
+_scalar_types = (str, int, float, bool, type(None))
+_scalar_casts = ((str, str.__str__), (int, int.__int__), (float, float.__float__))
+
+
+def _scalar(value):
+    "Return value as a JSON scalar type, other objects as strings"
+    if type(value) in _scalar_types:
+        return value
+    for base, cast in _scalar_casts:
+        if isinstance(value, base):
+            return cast(value)
+    return str(value)
+
+
+def iter_events(value, expand=None, json_keys=False):
+    """Yield (kind, item) events of a python value, without recursion
+
+    Containers yield map or seq events with True when empty, key events for
+    mappings keys, and end events with their kind. Other values yield scalar
+    events, objects which are not JSON types are strings. expand(value) may
+    return (kind, items) of other objects: (key, value) pairs iterator for
+    maps, values iterator for seqs, or a value for scalars. Keys are strings
+    with json_keys, like with json.dumps().
+    """
+
+    stack = [(iter((value,)), SEQ, None)]
+    active = set()
+    while True:
+        items, kind, ident = stack[-1]
+        item = next(items, END)
+        if item is END:
+            stack.pop()
+            if not stack:
+                return
+            active.discard(ident)
+            yield END, kind
+            continue
+
+        if kind == MAP:
+            key, item = item
+            key = _scalar(key)
+            if json_keys and not isinstance(key, str):
+                key = json.dumps(key)
+            yield KEY, key
+
+        expanded = expand(item) if expand is not None else None
+        if expanded is None:
+            if isinstance(item, dict):
+                expanded = MAP, iter(item.items())
+            elif isinstance(item, (list, tuple)):
+                expanded = SEQ, iter(item)
+            else:
+                expanded = SCALAR, item
+
+        kind, items = expanded
+        if kind == SCALAR:
+            yield SCALAR, _scalar(items)
+            continue
+
+        ident = id(item)
+        if ident in active:
+            raise ValueError("Circular reference detected")
+        head = next(items, END)
+        yield kind, head is END
+        if head is END:
+            yield END, kind
+            continue
+        active.add(ident)
+        stack.append((itertools.chain((head,), items), kind, ident))
+
+
+def emit_yaml(events, stream, headers=False):
+    """Write values events as YAML to stream
+
+    Scalars are represented and resolved like YAML.dump() does, so output is
+    the same than dumping the value, without anchors.
+    """
+
+    # pylint: disable=protected-access
+    instance = get_yaml()
+    _, representer, emitter = instance.get_serializer_representer_emitter(stream, None)
+    resolver = instance.resolver
+    default = str(resolver.resolve(ScalarNode, "", (False, True)))
+
+    def scalar(item):
+        "Return scalar event of a value, tags are implicit when possible"
+        node = representer.represent_data(item)
+        tag = node.tag
+        detected = str(resolver.resolve(ScalarNode, node.value, (True, False)))
+        implicit = (
+            tag == detected,
+            tag == default,
+            tag.startswith("tag:yaml.org,2002:"),
+        )
+        # Tags are objects in recent ruamel.yaml versions
+        tag = getattr(node, "ctag", tag)
+        return ScalarEvent(None, tag, implicit, node.value, style=node.style)
+
+    try:
+        emitter.emit(StreamStartEvent())
+        emitter.emit(
+            DocumentStartEvent(
+                explicit=headers, version=instance.version if headers else None
+            )
+        )
+        for kind, item in events:
+            if kind == END:
+                emitter.emit(MappingEndEvent() if item == MAP else SequenceEndEvent())
+            elif kind == MAP:
+                emitter.emit(MappingStartEvent(None, None, True, flow_style=item))
+            elif kind == SEQ:
+                emitter.emit(SequenceStartEvent(None, None, True, flow_style=item))
+            else:
+                emitter.emit(scalar(item))
+        emitter.emit(DocumentEndEvent(explicit=False))
+        emitter.emit(StreamEndEvent())
+    finally:
+        emitter.dispose()
+        instance.__dict__.pop("_serializer", None)
+        instance.__dict__.pop("_emitter", None)
+
+
 # =====================================================================
 # JSON Schema framework
 # =====================================================================
@@ -388,18 +731,198 @@ def _extend_with_default(validator_class):
 DefaultValidatingValidator = _extend_with_default(Draft202012Validator)
 
 
+# Number of compiled validators kept, least recently used ones are dropped
+VALIDATOR_CACHE_SIZE = 256
+
+# Checked and compiled validators, indexed by schema identity. Each entry keeps
+# a reference on its schema, so the id() can't be reused while cached.
+_validators = OrderedDict()
+_validators_lock = threading.Lock()
+_validators_stats = {"hits": 0, "misses": 0}
+
+
+def get_validator(schema, defaults=False):
+    """Return a checked and compiled validator for schema
+
+    Validators are cached by schema identity, so a schema dict must not be
+    modified once it has been used, or validator_cache_clear() must be called.
+    At most VALIDATOR_CACHE_SIZE validators are kept.
+
+    defaults:
+    * False: Use the validator class declared by the schema ($schema)
+    * True: Use DefaultValidatingValidator, which sets defaults on payload
+    """
+
+    key = (id(schema), defaults)
+    with _validators_lock:
+        cached = _validators.get(key)
+        if cached is not None and cached[0] is schema:
+            _validators.move_to_end(key)
+            _validators_stats["hits"] += 1
+            return cached[1]
+        _validators_stats["misses"] += 1
+
+    cls = DefaultValidatingValidator if defaults else validators.validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+    with _validators_lock:
+        _validators[key] = (schema, validator)
+        while len(_validators) > VALIDATOR_CACHE_SIZE:
+            _validators.popitem(last=False)
+    return validator
+
+
+def validator_cache_stats():
+    "Return validator cache statistics"
+    return dict(_validators_stats, size=len(_validators))
+
+
+def validator_cache_clear():
+    "Clear validator cache and reset statistics"
+    with _validators_lock:
+        _validators.clear()
+        _validators_stats["hits"] = 0
+        _validators_stats["misses"] = 0
+
+
 def json_validate_defaults(schema, payload):
     "Validate dict against schema and set defaults"
-    DefaultValidatingValidator(schema).validate(payload)
+    get_validator(schema, defaults=True).validate(payload)
     return payload
 
 
 def json_validate(schema, payload):
     "Validate dict against schema"
-    jsonschema.validate(payload, schema)
+    validator = get_validator(schema)
+    error = jsonschema.exceptions.best_match(validator.iter_errors(payload))
+    if error is not None:
+        raise error
     return payload
 
 
+# =====================================================================
+# Threading helpers
+# =====================================================================
+
+
+class RWLock:
+    """Reentrant readers-writer lock
+
+    Many threads can hold the read lock, while only one thread can hold the
+    write lock. Waiting writers have priority over new readers. A thread
+    holding the write lock can also read, but a thread holding only the read
+    lock can't write.
+
+    Readers make internal changes, like lazy children creation, within
+    building(): changes are serialized by mutex, and the write lock is not
+    acquired again by the code they run.
+    """
+
+    def __init__(self):
+        self.mutex = threading.RLock()
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        "Acquire read lock"
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        if depth or self._writer == threading.get_ident():
+            local.depth = depth + 1
+            return
+
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        local.depth = 1
+
+    def release_read(self):
+        "Release read lock"
+        local = self._local
+        local.depth -= 1
+        if local.depth or self._writer == threading.get_ident():
+            return
+
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        "Acquire write lock"
+        if getattr(self._local, "building", 0):
+            return
+        ident = threading.get_ident()
+        if self._writer == ident:
+            self._writer_depth += 1
+            return
+        if getattr(self._local, "depth", 0):
+            raise RuntimeError("Can't acquire write lock while holding read lock")
+
+        with self._cond:
+            self._writers_waiting += 1
+            while self._readers or self._writer is not None:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = ident
+            self._writer_depth = 1
+
+    def release_write(self):
+        "Release write lock"
+        if getattr(self._local, "building", 0):
+            return
+        self._writer_depth -= 1
+        if self._writer_depth:
+            return
+
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+
+    @contextmanager
+    def building(self):
+        """Internal changes context manager, with read lock and mutex held
+
+        Write lock acquisitions are skipped until exit, the mutex is only
+        taken with the read lock held, so waiting writers can't deadlock.
+        """
+        self.acquire_read()
+        try:
+            with self.mutex:
+                local = self._local
+                depth = getattr(local, "building", 0)
+                local.building = depth + 1
+                try:
+                    yield self
+                finally:
+                    local.building = depth
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def read(self):
+        "Read lock context manager"
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        "Write lock context manager"
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+
 # =====================================================================
 # Command Execution framework
 # =====================================================================
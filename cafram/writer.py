@@ -0,0 +1,144 @@
+"""
+Streaming writers
+
+Write node trees, or plain python values, as JSON or YAML to file like
+objects. Trees are walked node by node, without building their values
+(get_value(lvl=-1)) nor the whole document string, so memory stays flat on
+large trees. Output is the same than serializing tree values with
+utils.serialize(), json.dumps(indent=2) or utils.to_yaml(). Objects which
+are not JSON types are written as strings.
+"""
+
+import json
+from json.encoder import encode_basestring_ascii
+
+from cafram.base import Base, InvalidSyntax
+from cafram.utils import MAP, SEQ, KEY, END, SCALAR, iter_events, emit_yaml
+
+# Nodes events
+# =====================================
+
+
+def _node_dict_items(node):
+    "Yield (key, value) of a NodeDict, like its get_value(lvl=-1)"
+
+    # pylint: disable=protected-access
+    if node._node_pending:
+        node._node_lazy_build()
+
+    nodes = node._nodes
+    children = {}
+    for item_def in node._node_conf_struct:
+        child = nodes.get(item_def.attr)
+        if isinstance(child, Base):
+            children[item_def.attr] = child
+
+    parsed = node._node_conf_parsed
+    for key, value in parsed.items():
+        yield key, children.get(key, value)
+    for attr, child in children.items():
+        if attr not in parsed:
+            yield attr, child
+
+
+def _node_list_items(node):
+    "Return values of a NodeList, like its get_value(lvl=-1)"
+
+    # pylint: disable=protected-access
+    if node._nodes or node._node_items is not None:
+        return iter(node)
+    return iter(node._node_conf_parsed or [])
+
+
+def expand_node(item):
+    "Return (kind, items) of a node for iter_events(), or None"
+
+    # pylint: disable=protected-access
+    if not isinstance(item, Base):
+        return None
+    kind = item._node_kind
+    if kind == "Dict":
+        return MAP, _node_dict_items(item)
+    if kind == "List":
+        return SEQ, _node_list_items(item)
+
+    value = item._node_conf_parsed
+    if isinstance(value, dict):
+        return MAP, iter(value.items())
+    if isinstance(value, (list, tuple)):
+        return SEQ, iter(value)
+    return SCALAR, value
+
+
+# Writers
+# =====================================
+
+
+def _json_key(key):
+    "Return JSON string of a mapping key"
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    return json.dumps(json.dumps(key))
+
+
+def write_json(value, stream, indent=2):
+    """Write a node tree or a python value as JSON to stream
+
+    Output is the same than json.dumps(value, indent=indent), indent=None
+    writes compact JSON.
+    """
+
+    # Containers stack, with True when they have items
+    stack = []
+    newline = "\n" if indent is not None else ""
+    step = " " * indent if indent is not None else ""
+    separator = ", " if indent is None else ","
+
+    for kind, item in iter_events(value, expand=expand_node):
+
+        if kind == END:
+            container, has_items = stack.pop()
+            close = "}" if container == MAP else "]"
+            if has_items:
+                stream.write(newline + step * len(stack) + close)
+            else:
+                stream.write(close)
+            continue
+
+        # Items separators and indentation
+        if stack and (kind == KEY or stack[-1][0] == SEQ):
+            prefix = separator if stack[-1][1] else ""
+            stream.write(prefix + newline + step * len(stack))
+            stack[-1][1] = True
+
+        if kind == KEY:
+            stream.write(_json_key(item) + ": ")
+        elif kind == MAP:
+            stream.write("{")
+            stack.append([MAP, False])
+        elif kind == SEQ:
+            stream.write("[")
+            stack.append([SEQ, False])
+        elif isinstance(item, str):
+            stream.write(encode_basestring_ascii(item))
+        else:
+            stream.write(json.dumps(item))
+
+
+def write_yaml(value, stream, headers=False):
+    """Write a node tree or a python value as YAML to stream
+
+    Output is the same than utils.to_yaml(value, headers=headers).
+    """
+    emit_yaml(iter_events(value, expand=expand_node), stream, headers=headers)
+
+
+def write_stream(value, stream, fmt="json"):
+    "Write a node tree or a python value as JSON or YAML to stream"
+
+    if fmt == "json":
+        write_json(value, stream)
+    elif fmt in ["yaml", "yml"]:
+        write_yaml(value, stream)
+    else:
+        raise InvalidSyntax(f"Unknown format: {fmt}")
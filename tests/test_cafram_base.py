@@ -1,13 +1,21 @@
+import io
 import sys
+import copy
+import json
+import pickle
 import unittest
 from pprint import pprint
 import pytest
 import logging
 import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import cafram
 
-from cafram.base import MissingIdent, InvalidSyntax
+from cafram.base import MissingIdent, InvalidSyntax, ApplicationError, MissingNode
 from cafram.nodes import (
     Base,
     NodeMap,
@@ -16,6 +24,8 @@ from cafram.nodes import (
     NodeList,
     NotExpectedType,
     NodeMapEnv,
+    NodeAuto,
+    collect_stats,
     expand_envar_syntax,
 )
 
@@ -72,6 +82,17 @@ class Test01_ConfVal(unittest.TestCase):
         # self.assertEqual(node._node_parent, node._node_root)
         # self.assertEqual(node._node_parent, None)
 
+    def test_shared_node_logger(self):
+        """
+        Ensure nodes of the same level share their logger adapter
+        """
+
+        node1 = NodeMap(ident="TestInstance1", payload={"key": {}}, autoconf=-1)
+        node2 = NodeMap(ident="TestInstance2", payload={"key": {}}, autoconf=-1)
+        self.assertIs(node1._node_log, node2._node_log)
+        self.assertIs(node1.key._node_log, node2.key._node_log)
+        self.assertIsNot(node1._node_log, node1.key._node_log)
+
     def test_dump_method(self):
         """
         Ensure the dump method works correctly
@@ -81,6 +102,862 @@ class Test01_ConfVal(unittest.TestCase):
         node.dump()
 
 
+# Compact classes
+# ================================
+
+
+class CompactConfig(NodeMap):
+    "Compact NodeMap with class level defaults"
+
+    __slots__ = ()
+    ident = "CompactIdent"
+    kind = "CompactKind"
+
+
+def test_compact_nodes():
+    "Ensure nodes without __dict__ keep working"
+
+    payload = {"key": "value", "sub": {"key2": "value2"}}
+    node = CompactConfig(payload=payload, autoconf=-1)
+    assert CompactConfig.__dictoffset__ == 0
+    assert node.ident == "CompactIdent"
+    assert node.kind == "CompactKind"
+    assert CompactConfig.ident == "CompactIdent"
+    assert node.key == "value"
+    assert node.sub.key2 == "value2"
+    node.sub.shared["data"] = "value"
+    assert node.sub.shared == {"data": "value"}
+    assert node.shared == {}
+
+    # Payload keys named like the shared slot are config values
+    other = NodeMap(ident="Shared", payload={"_shared": "value"})
+    assert other.shared == {}
+    assert other.get_value() == {"_shared": "value"}
+    assert node.__dict__["ident"] == "CompactIdent"
+
+    node.key = "new_value"
+    assert node.get_value() == {"key": "new_value"}
+    try:
+        node.unknown = "value"
+        assert False, "Compact nodes should not accept unknown attributes"
+    except AttributeError:
+        pass
+
+
+def test_dict_backed_nodes():
+    "Ensure regular subclasses still accept instance attributes"
+
+    class DictConfig(NodeMap):
+        ident = "DictIdent"
+
+    node = DictConfig(payload={"key": "value"})
+    node.unknown = "value"
+    assert node.unknown == "value"
+    assert node.ident == "DictIdent"
+
+
+@pytest.mark.parametrize("cls", [NodeMap, CompactConfig])
+def test_copy_nodes(cls):
+    "Ensure copied and unpickled nodes keep their payload"
+
+    payload = {"kind": "k", "log": "l", "ident": "i", "sub": {"key": "value"}}
+    node = cls(ident="Copy", payload=payload, autoconf=-1)
+    for other in [copy.copy(node), pickle.loads(pickle.dumps(node))]:
+        assert node.get_value(lvl=-1) == payload
+        assert other.get_value(lvl=-1) == payload
+        assert other.kind == node.kind
+        assert other.ident == "Copy"
+        assert other.sub.key == "value"
+
+
+# Lazy children
+# ================================
+
+
+class LazyChild(NodeMap):
+    "Record hooks calls"
+
+    calls = []
+
+    def node_hook_final(self):
+        self.calls.append(self.ident)
+
+
+class LazyConfig(NodeMap):
+    "Lazy NodeMap"
+
+    conf_lazy = True
+    conf_children = [
+        {"key": "first", "cls": LazyChild, "hook": "hook_first"},
+        {"key": "second", "cls": LazyChild},
+        {"key": "value"},
+    ]
+
+    def hook_first(self):
+        LazyChild.calls.append("hook_first")
+
+
+lazy_payload = {
+    "first": {"key1": "value1"},
+    "second": {"key2": {"nested": "value2"}},
+    "value": "string",
+}
+
+
+def test_lazy_children():
+    "Ensure lazy children are only built on first access"
+
+    LazyChild.calls = []
+    node = LazyConfig(ident="LazyTest", payload=lazy_payload)
+    assert LazyChild.calls == []
+    assert node.value == "string"
+    assert node.get_value() == {"value": "string"}
+
+    assert node.second.key2 == {"nested": "value2"}
+    assert LazyChild.calls == ["second"]
+    assert node.first.key1 == "value1"
+    assert LazyChild.calls == ["second", "first", "hook_first"]
+    assert list(node.get_children()) == ["first", "second"]
+
+
+def test_lazy_children_values():
+    "Ensure lazy trees returns the same values as eager ones"
+
+    lazy = LazyConfig(ident="LazyTest", payload=lazy_payload)
+    eager = LazyConfig(ident="EagerTest", payload=lazy_payload, lazy=False)
+    assert lazy.get_value(lvl=-1) == eager.get_value(lvl=-1)
+    assert list(lazy.get_children()) == list(eager.get_children())
+
+    auto = NodeMap(ident="AutoLazy", payload=lazy_payload, autoconf=-1, lazy=True)
+    assert auto.second._node_lazy
+    assert auto.get_value(lvl=-1) == lazy_payload
+
+
+class LazyItems(NodeList):
+    "Lazy NodeList"
+
+    conf_lazy = True
+    conf_lazy_cache = 4
+    conf_children = LazyChild
+
+
+lazy_items = [{"name": f"item_{idx}", "idx": idx} for idx in range(20)]
+
+
+def test_lazy_list():
+    "Ensure lazy lists create items on access, and keep a bounded cache"
+
+    LazyChild.calls = []
+    node = LazyItems(ident="LazyList", payload=lazy_items)
+    assert LazyChild.calls == []
+    assert len(node) == 20
+
+    assert node[3].name == "item_3"
+    assert node[-1].idx == 19
+    assert node[-1] is node[19]
+    assert [item.idx for item in node[5:11:2]] == [5, 7, 9]
+    assert LazyChild.calls == [f"LazyList_{idx}" for idx in (3, 19, 5, 7, 9)]
+    with pytest.raises(IndexError):
+        node[20]  # pylint: disable=pointless-statement
+
+    assert [item.idx for item in node] == list(range(20))
+    assert len(node._node_items.cache) == 4
+    assert list(node._node_items.cache) == [16, 17, 18, 19]
+
+
+def test_lazy_list_values():
+    "Ensure lazy lists returns the same values as eager ones"
+
+    payload = {"items": lazy_items, "nested": [[1, 2], [3]]}
+    lazy = NodeMap(ident="LazyList", payload=payload, autoconf=-1, lazy=True)
+    eager = NodeMap(ident="EagerList", payload=payload, autoconf=-1)
+
+    assert lazy.items._node_items is not None
+    assert lazy.get_value(lvl=-1) == eager.get_value(lvl=-1) == payload
+    assert len(lazy.items) == len(eager.items)
+    assert lazy.items[2].name == eager.items[2].name
+    assert lazy.nested[1].get_value() == [3]
+
+
+# Children plans
+# ================================
+
+
+def test_children_plan_shared():
+    "Ensure static conf_children are compiled once per class"
+
+    node1 = LazyConfig(ident="Plan1", payload=lazy_payload, lazy=False)
+    node2 = LazyConfig(ident="Plan2", payload={}, lazy=False)
+    plan = node1._node_conf_struct.data
+    assert isinstance(plan, tuple)
+    assert plan is node2._node_conf_struct.data
+    assert [item.key for item in plan] == ["first", "second", "value"]
+    assert [item.is_node for item in plan] == [True, True, False]
+
+    class OtherPlan(LazyConfig):
+        "Use another plan"
+        conf_children = [{"key": "other"}]
+
+    node3 = OtherPlan(ident="Plan3", payload={"other": 1}, lazy=False)
+    assert node3._node_conf_struct.data is not plan
+    assert node3.other == 1
+
+
+# Defaults
+# ================================
+
+
+class DefaultsConfig(NodeMap):
+    "NodeMap with mutable defaults"
+
+    conf_default = {
+        "name": "default",
+        "tags": ["tag1"],
+        "nested": {"key": "value"},
+    }
+
+
+def test_defaults_copy_on_write():
+    "Ensure mutable defaults are not shared between instances"
+
+    node1 = DefaultsConfig(ident="Node1")
+    node2 = DefaultsConfig(ident="Node2", payload={"tags": ["tag2"]})
+    node1.tags.append("tag3")
+    node1.nested["key"] = "changed"
+
+    assert DefaultsConfig.conf_default["tags"] == ["tag1"]
+    assert DefaultsConfig.conf_default["nested"] == {"key": "value"}
+    assert node1.get_value(lvl=-1) == {
+        "name": "default",
+        "tags": ["tag1", "tag3"],
+        "nested": {"key": "changed"},
+    }
+    assert node2.get_value(lvl=-1) == {
+        "name": "default",
+        "tags": ["tag2"],
+        "nested": {"key": "value"},
+    }
+    assert DefaultsConfig(ident="Node3").get_value(lvl=-1) == (
+        DefaultsConfig.conf_default
+    )
+
+
+# Dedupe
+# ================================
+
+
+class DedupeFilter(NodeMap):
+    "Count payload transformations"
+
+    transforms = 0
+    conf_default = {"enabled": True, "tags": []}
+
+    def node_hook_transform(self, payload):
+        DedupeFilter.transforms += 1
+        return payload
+
+
+class DedupeFilters(NodeList):
+    "List of filters"
+
+    conf_children = DedupeFilter
+
+
+def test_dedupe():
+    "Ensure identical payloads are parsed once in dedupe mode"
+
+    payload = [{"name": "filter1"}] * 6 + [{"name": "filter2", "tags": ["a"]}] * 4
+    eager = DedupeFilters(ident="Eager", payload=payload)
+
+    cafram.nodes.dedupe_cache_clear()
+    DedupeFilter.transforms = 0
+    node = DedupeFilters(ident="Dedupe", payload=payload, dedupe=True)
+
+    assert DedupeFilter.transforms == 2
+    assert node.get_value(lvl=-1) == eager.get_value(lvl=-1)
+    assert node[0] is not node[1]
+    assert node[0]._node_conf_parsed is not node[1]._node_conf_parsed
+    node[0].tags.append("b")
+    assert node[1].tags == []
+
+    stats = cafram.nodes.dedupe_cache_stats()
+    assert stats == {"hits": 8, "misses": 3, "size": 3, "ratio": 8 / 11}
+
+
+class DedupeIdent(NodeMap):
+    "Ident from transformed payload"
+
+    conf_ident = "{payload2[name]}"
+
+    def node_hook_transform(self, payload):
+        return dict(payload, name=payload["name"].upper())
+
+
+class DedupeIdents(NodeList):
+    "List of idents"
+
+    conf_children = DedupeIdent
+
+
+def test_dedupe_ident():
+    "Ensure conf_ident formats the same payloads on dedupe cache hits"
+
+    payload = [{"name": "filter1"}] * 3
+    node = DedupeIdents(ident="Dedupe", payload=payload, dedupe=True)
+
+    assert [child.ident for child in node] == ["FILTER1"] * 3
+
+
+# Parallel builds
+# ================================
+
+
+class ParallelItem(NodeMap):
+    "Record the process which ran hooks"
+
+    def node_hook_final(self):
+        self.pid = os.getpid()
+
+
+class ParallelItems(NodeList):
+    "Parallel list"
+
+    conf_children = ParallelItem
+    conf_parallel = 2
+    conf_parallel_threshold = 10
+
+
+class ParallelMap(NodeMap):
+    "Parallel dict"
+
+    conf_children = ParallelItem
+    conf_parallel = 2
+    conf_parallel_threshold = 10
+
+
+def test_parallel_list():
+    "Ensure parallel built lists are attached to their parents"
+
+    payload = [{"idx": idx, "nested": {"key": idx}} for idx in range(50)]
+    node = ParallelItems(ident="Parallel", payload=payload, autoconf=-1)
+
+    assert node.get_value(lvl=-1) == payload
+    assert {item.pid for item in node} != {os.getpid()}
+    for idx, item in enumerate(node):
+        assert item.ident == f"Parallel_{idx}"
+        assert item._node_parent is node
+        assert item.nested._node_parent is item
+        assert item.nested._node_root is node
+        assert item.nested._node_lvl == 3
+        assert item.shared is not node.shared
+
+    small = ParallelItems(ident="Serial", payload=payload[:5])
+    assert {item.pid for item in small} == {os.getpid()}
+
+
+def test_parallel_reserved_keys():
+    "Ensure payload keys named like node attributes survive parallel builds"
+
+    payload = [{"kind": "k", "log": "l", "ident": "i", "idx": idx} for idx in range(20)]
+    node = ParallelItems(ident="Parallel", payload=payload)
+
+    assert node.get_value(lvl=-1) == payload
+    assert node[0].kind == "ParallelItem"
+    assert node[0].ident == "Parallel_0"
+    assert node[0].get_value() == payload[0]
+
+
+def test_parallel_dict():
+    "Ensure parallel built dicts are attached to their parents"
+
+    payload = {f"key_{idx}": {"idx": idx} for idx in range(50)}
+    node = ParallelMap(ident="Parallel", payload=payload)
+
+    assert node.get_value(lvl=-1) == payload
+    assert list(node.get_children()) == list(payload)
+    assert node.key_3.idx == 3
+    assert node.key_3._node_parent is node
+    assert node.key_3.pid != os.getpid()
+
+
+# Thread safety
+# ================================
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_lock_stress(lazy):
+    "Ensure readers never see partial updates in lock mode"
+
+    payload = {
+        "first": {"value": 0},
+        "second": {"value": 0},
+        "items": [{"value": 0}],
+    }
+    node = NodeMap(ident="Locked", payload=payload, autoconf=-1, lock=True, lazy=lazy)
+    assert node.first.get_lock() is node.get_lock() is not None
+    assert NodeMap(ident="Unlocked", payload=payload).get_lock() is None
+
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            with node.get_lock().read():
+                values = {node.first.value, node.second.value, node.items[0].value}
+            value = node.get_value(lvl=-1)
+            stream = io.StringIO()
+            node.write_stream(stream)
+            for value in (value, json.loads(stream.getvalue())):
+                snapshot = {value[key]["value"] for key in ("first", "second")}
+                snapshot.add(value["items"][0]["value"])
+                if len(values) != 1 or len(snapshot) != 1:
+                    errors.append((values, snapshot))
+
+    def writer():
+        for idx in range(1, 101):
+            node.apply_patch(
+                [
+                    {"op": "replace", "path": "/first/value", "value": idx},
+                    {"op": "replace", "path": "/second/value", "value": idx},
+                    {"op": "replace", "path": "/items/0", "value": {"value": idx}},
+                ]
+            )
+        done.set()
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert node.get_value(lvl=-1)["items"] == [{"value": 100}]
+
+
+def test_lock_lazy():
+    "Ensure lazy children are created by readers in lock mode"
+
+    class Lazy(NodeMap):
+        "Lazy locked map"
+
+        conf_lock = True
+        conf_lazy = True
+        conf_children = [{"key": "first", "cls": NodeMap}]
+
+    assert Lazy(ident="Lazy", payload={"first": {"key": 1}}).first.key == 1
+    node = Lazy(ident="Lazy", payload={"first": {"key": 1}})
+    assert node.get_value(lvl=-1) == {"first": {"key": 1}}
+
+    node = NodeAuto(ident="Auto", payload={"items": [{"key": 1}]}, lazy=True, lock=True)
+    assert node.items._node_lazy and node.items[0].key == 1
+
+    # Concurrent readers create each child once
+    payload = {"items": [{"key": idx} for idx in range(200)]}
+    node = NodeAuto(ident="Auto", payload=payload, lazy=True, lock=True)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        values = list(pool.map(lambda _: node.get_value(lvl=-1), range(16)))
+    assert all(value == payload for value in values)
+
+
+# Async builds
+# ================================
+
+
+class AsyncChild(NodeMap):
+    "Record async hooks"
+
+    events = []
+    running = [0, 0]
+
+    async def node_hook_conf(self):
+        running = self.running
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        self.events.append((self.ident, "conf"))
+
+    async def node_hook_final(self):
+        self.events.append((self.ident, "final"))
+
+
+class AsyncChildren(NodeList):
+    "Async children list"
+
+    conf_children = AsyncChild
+
+
+class AsyncParent(NodeMap):
+    "Async children in dict and list"
+
+    conf_children = [
+        {"key": "first", "cls": AsyncChild, "hook": "hook_child"},
+        {"key": "second", "cls": AsyncChild},
+        {"key": "items", "cls": AsyncChildren, "hook": "hook_child"},
+    ]
+
+    async def hook_child(self):
+        AsyncChild.events.append((self.ident, "hook"))
+
+    async def node_hook_final(self):
+        AsyncChild.events.append((self.ident, "final"))
+
+
+class InitOverride(NodeMap):
+    "Record constructor arguments"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.init_args = kwargs
+
+
+def test_async_build():
+    "Test async hooks order and concurrency"
+
+    payload = {"first": {}, "second": {}, "items": [{}] * 6}
+
+    AsyncChild.events = []
+    AsyncChild.running = [0, 0]
+    node = asyncio.run(AsyncParent.abuild(ident="Parent", payload=payload))
+    events = AsyncChild.events
+    assert isinstance(node.first, AsyncChild) and len(node.items) == 6
+    assert len(events) == 8 * 2 + 2 + 1
+    assert events[:3] == [("first", "conf"), ("first", "final"), ("Parent", "hook")]
+    assert events[-2:] == [("Parent", "hook"), ("Parent", "final")]
+    for ident in ["first", "second"] + [f"items_{idx}" for idx in range(6)]:
+        assert events.index((ident, "conf")) < events.index((ident, "final"))
+    # Dict children up to the next item hook and the list children run their
+    # hooks concurrently
+    assert AsyncChild.running[1] == 7
+
+    # Hooks are limited
+    AsyncChild.running = [0, 0]
+    asyncio.run(AsyncParent.abuild(ident="Parent", payload=payload, limit=2))
+    assert AsyncChild.running[1] == 2
+
+    # Synchronous builds can't await hooks
+    with pytest.raises(ApplicationError):
+        AsyncParent(ident="Parent", payload=payload)
+
+    node = asyncio.run(NodeAuto.abuild(ident="Auto", payload={"key": {"sub": [1]}}))
+    assert node.key.sub.get_value() == [1]
+
+    # Constructors overrides are run
+    node = asyncio.run(InitOverride.abuild(ident="Init", payload={"key": "value"}))
+    assert node.init_args == {"ident": "Init", "payload": {"key": "value"}}
+    assert node.key == "value"
+
+
+# Build statistics
+# ================================
+
+
+class SlowHook(NodeMap):
+    "Node with a slow hook"
+
+    def node_hook_final(self):
+        time.sleep(0.01)
+
+
+class SlowParent(NodeMap):
+    "Parent of slow nodes"
+
+    conf_stats = True
+    conf_children = [
+        {"key": "first", "cls": SlowHook},
+        {"key": "second", "cls": SlowHook},
+    ]
+
+
+def test_build_stats():
+    "Test phases statistics"
+
+    payload = {"first": {"key": 1}, "second": {"key": 2}}
+    assert NodeMap(ident="Plain", payload=payload).get_stats() is None
+
+    with collect_stats() as stats:
+        node = NodeMap(ident="Root", payload={"slow": payload}, autoconf=-1)
+    assert node.slow.get_stats() is stats
+
+    report = stats.report()
+    name = "cafram.nodes.NodeMap"
+    assert report[name]["validate"]["calls"] == 4
+    assert set(report[name]) == {
+        "validate",
+        "transform",
+        "defaults",
+        "conf",
+        "build",
+        "children",
+        "final",
+    }
+
+    # Statistics are recorded by conf_stats roots
+    node = SlowParent(ident="Slow", payload=payload)
+    report = node.get_stats().report()
+    final = report[f"{__name__}.SlowHook"]["final"]
+    assert final["calls"] == 2 and final["time"] >= 0.02
+    assert node.get_stats().slowest(1)[0][:2] == (f"{__name__}.SlowParent", "build")
+
+    node.set_path("first.key", 3)
+    assert node.get_stats().report()[f"{__name__}.SlowHook"]["final"]["calls"] == 3
+
+
+# Nodes paths
+# ================================
+
+
+def test_node_paths():
+    "Test paths lookups"
+
+    payload = {"files": [{"name": "a"}, {"name": "b", "filters": {"x": 1}}]}
+    node = NodeMap(ident="Root", payload=payload, autoconf=-1)
+    filters = node.files[1].filters
+
+    assert node.get_path() == ""
+    assert filters.get_path() == "files.1.filters"
+    assert filters.get_path(pointer=True) == "/files/1/filters"
+    assert filters.get_parents() == [node.files[1], node.files, node]
+    for path in ("files.1.filters", "files[1].filters", "/files/1/filters"):
+        assert node.get_node(path) is filters
+    assert node.files.get_node("1.filters") is filters
+    assert node.get_node("") is node
+
+    for path in ("files.2", "files.1.name", "missing"):
+        with pytest.raises(MissingNode):
+            node.get_node(path)
+
+    # Lazy children are created on lookup
+    LazyChild.calls = []
+    node = LazyConfig(ident="Lazy", payload={"first": {}, "second": {}})
+    assert node.get_node("second").get_path() == "second"
+    assert LazyChild.calls == ["second"]
+
+
+# Values cache
+# ================================
+
+
+def test_value_cache(monkeypatch):
+    "Ensure cached values are cleared when nodes change"
+
+    monkeypatch.setattr(cafram.nodes, "VALUE_CACHE", True)
+    payload = {"a": {"b": {"c": 1}}, "items": [{"d": 1}, {"d": 2}]}
+    node = NodeMap(ident="Root", payload=payload, autoconf=-1)
+    value = node.get_value(lvl=-1)
+    assert node.get_value(lvl=-1) is value
+    assert node.a.get_value(lvl=-1) is value["a"]
+
+    # Attributes changes clear values up to the root
+    node.a.b.c = 2
+    assert node.get_value(lvl=-1) == {
+        "a": {"b": {"c": 2}},
+        "items": [{"d": 1}, {"d": 2}],
+    }
+    assert node.items.get_value(lvl=-1) is value["items"]
+
+    node.set_path("items.1.d", 3)
+    assert node.get_value(lvl=-1)["items"] == [{"d": 1}, {"d": 3}]
+
+    node.add_child("a", NodeMap(ident="new", payload={"e": 1}))
+    assert node.get_value(lvl=-1)["a"] == {"e": 1}
+
+    # Lazy lists children are created again, their values are not cached
+    node = LazyItems(ident="Lazy", payload=[{"d": 1}, {"d": 2}])
+    assert node.get_value(lvl=-1) is not node.get_value(lvl=-1)
+
+
+def test_value_no_cache():
+    "Ensure returned values can be modified without cache"
+
+    payload = {"a": {"b": {"c": 1}}, "items": [{"d": 1}, {"d": 2}]}
+    node = NodeMap(ident="Root", payload=payload, autoconf=-1)
+    value = node.get_value(lvl=-1)
+    value["a"]["b"]["c"] = 2
+    value["items"].append({"d": 3})
+    del value["a"]
+    assert node.get_value(lvl=-1) == payload
+    assert node.a.b.c == 1
+
+
+# Build scaling
+# ================================
+
+
+def make_wide_payload(size):
+    "Return a payload with size keys, one of ten is a dict"
+    return {f"key_{idx}": {"idx": idx} if idx % 10 == 0 else idx for idx in range(size)}
+
+
+def test_build_linear_scaling(monkeypatch):
+    "Ensure dict children are built without reading the whole value per child"
+
+    calls = []
+    get_value = NodeMap.get_value
+
+    def counted_get_value(self, *args, **kwargs):
+        calls.append(self)
+        return get_value(self, *args, **kwargs)
+
+    monkeypatch.setattr(NodeMap, "get_value", counted_get_value)
+
+    for size in (500, 5000):
+        calls.clear()
+        payload = make_wide_payload(size)
+        node = NodeMap(ident="Wide", payload=payload, autoconf=-1)
+
+        # Quadratic builds call get_value() once per children
+        assert not calls
+        assert len(node.get_children()) == size // 10
+        assert node.get_value(lvl=-1) == payload
+
+
+# Iterative build
+# ================================
+
+
+def make_deep_payload(depth):
+    "Return a deeply nested payload"
+    payload = {"leaf": "value"}
+    for idx in range(depth):
+        payload = {"child": payload, "items": [[idx]]}
+    return payload
+
+
+def test_iterative_build_depth():
+    "Ensure very deep trees can be built"
+
+    node = NodeMap(ident="Deep", payload=make_deep_payload(10000), autoconf=-1)
+    depth = 0
+    while "child" in node.get_children():
+        assert node.items[0].get_value() == [9999 - depth]
+        node = node.child
+        depth += 1
+    assert depth == 10000
+    assert node.leaf == "value"
+    assert node._node_lvl == 10001
+
+
+def test_iterative_build_list_depth():
+    "Ensure very deep lists can be built"
+
+    payload = ["leaf"]
+    for _ in range(10000):
+        payload = [payload]
+    node = NodeList(ident="Deep", payload=payload, autoconf=-1)
+    depth = 0
+    while node.get_children():
+        node = node[0]
+        depth += 1
+    assert depth == 10000
+    assert node.get_value() == ["leaf"]
+
+
+class HookTracer(NodeMap):
+    "Record hooks calls order"
+
+    calls = []
+
+    def node_hook_init(self):
+        self.calls.append(("init", self.ident))
+
+    def node_hook_conf(self):
+        self.calls.append(("conf", self.ident))
+
+    def node_hook_children(self):
+        self.calls.append(("children", self.ident))
+
+    def node_hook_final(self):
+        self.calls.append(("final", self.ident))
+
+
+class HookTracerList(NodeList):
+    "Record hooks calls order"
+
+    conf_children = HookTracer
+
+    def node_hook_final(self):
+        HookTracer.calls.append(("final", self.ident))
+
+
+class HookTracerRoot(HookTracer):
+    "Record hooks calls order"
+
+    conf_children = [
+        {"key": "first", "cls": HookTracer, "hook": "hook_first"},
+        {"key": "items", "cls": HookTracerList},
+        {"key": "last", "cls": HookTracer},
+    ]
+
+    def hook_first(self):
+        self.calls.append(("hook_first", self.ident))
+
+
+def test_iterative_build_hooks(monkeypatch):
+    "Ensure iterative and recursive builds run hooks in the same order"
+
+    payload = {
+        "first": {"key": "value"},
+        "items": [{"name": "item1"}, {"name": "item2"}],
+        "last": {},
+    }
+
+    results = []
+    for iterative in (True, False):
+        monkeypatch.setattr(cafram.nodes, "ITERATIVE_BUILD", iterative)
+        HookTracer.calls = []
+        node = HookTracerRoot(ident="Root", payload=payload)
+        results.append((HookTracer.calls, node.get_value(lvl=-1)))
+
+    assert results[0] == results[1]
+    assert results[0][1] == payload
+    assert results[0][0][:7] == [
+        ("init", "Root"),
+        ("conf", "Root"),
+        ("init", "first"),
+        ("conf", "first"),
+        ("children", "first"),
+        ("final", "first"),
+        ("hook_first", "Root"),
+    ]
+    assert results[0][0][-2:] == [("children", "Root"), ("final", "Root")]
+
+
+class BuildOverride(NodeMap):
+    "Override children build"
+
+    conf_children = [{"key": "items", "cls": HookTracerList}]
+    built = []
+
+    def _node_conf_build(self):
+        super()._node_conf_build()
+        self.built.append(sorted(self._nodes))
+
+
+class BuildOverrideList(NodeList):
+    "Override children build"
+
+    conf_children = BuildOverride
+
+    def _node_conf_build(self):
+        super()._node_conf_build()
+        BuildOverride.built.append(len(self._nodes))
+
+
+@pytest.mark.parametrize("iterative", [True, False])
+def test_build_override(monkeypatch, iterative):
+    "Ensure _node_conf_build overrides still build children"
+
+    monkeypatch.setattr(cafram.nodes, "ITERATIVE_BUILD", iterative)
+    BuildOverride.built = []
+    payload = [{"name": "item", "items": [{"name": "item1"}]}, {"items": []}]
+    node = BuildOverrideList(ident="Root", payload=payload)
+    assert BuildOverride.built == [["items"], ["items"], 2]
+    assert node.get_value(lvl=-1) == payload
+    assert node[0].items[0].name == "item1"
+
+
 # ConfMixed Testing
 # ================================
 
@@ -0,0 +1,72 @@
+import sys
+
+from cafram.nodes import NodeMap, NodeList
+from cafram.memory import deep_sizeof
+
+
+# Sizes testing
+# =====================================
+
+
+def test_deep_sizeof():
+    "Ensure shared objects are counted once"
+
+    value = ["a" * 100]
+    payload = {"first": value, "second": value}
+    seen = set()
+    size = deep_sizeof(payload, seen)
+    assert size < sys.getsizeof(payload) + 2 * sys.getsizeof(value) + 200
+    assert deep_sizeof(value, seen) == 0
+
+
+# Nodes testing
+# =====================================
+
+
+class Item(NodeMap):
+    "Item"
+
+
+class Items(NodeList):
+    "Items list"
+
+    conf_children = Item
+
+
+class Config(NodeMap):
+    "Config"
+
+    conf_children = [{"key": "items", "cls": Items}]
+
+
+payload = {"name": "config", "items": [{"name": f"item_{idx}"} for idx in range(10)]}
+
+
+def test_memory_report():
+    "Test bytes per node class"
+
+    node = Config(ident="Config", payload=payload, shared={"data": "x" * 1000})
+    report = node.get_memory_report()
+
+    assert report["nodes"] == 12
+    classes = report["classes"]
+    assert classes[f"{__name__}.Item"]["count"] == 10
+    assert classes[f"{__name__}.Items"]["count"] == 1
+    assert report["shared"] > 1000
+    assert report["loggers"] > 0
+    assert report["total"] == report["loggers"] + report["shared"] + sum(
+        item["total"] for item in classes.values()
+    )
+
+    # Payloads shared by children and parents are counted once
+    assert classes[f"{__name__}.Item"]["raw"] > 0
+    assert classes[f"{__name__}.Items"]["raw"] < classes[f"{__name__}.Item"]["raw"]
+
+
+def test_memory_report_tracemalloc():
+    "Test construction allocations"
+
+    node = Config(ident="Config", payload=payload)
+    report = node.get_memory_report(mode="tracemalloc")
+    assert report["nodes"] == 12
+    assert 0 < report["current"] <= report["peak"]
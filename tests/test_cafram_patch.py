@@ -0,0 +1,233 @@
+import pytest
+
+from cafram.base import PatchError, SchemaError
+from cafram.nodes import NodeMap, NodeList
+from cafram.patch import parse_path, with_path
+
+
+# Paths testing
+# =====================================
+
+
+def test_parse_path():
+    "Test json pointers and dotted paths"
+
+    assert parse_path("") == []
+    assert parse_path("/a/0/b~1c/d~0e") == ["a", "0", "b/c", "d~e"]
+    assert parse_path("a.0.b") == ["a", "0", "b"]
+    assert parse_path("a[0].b") == ["a", "0", "b"]
+    assert parse_path("[0][1]") == ["0", "1"]
+    assert parse_path(["a", 0]) == ["a", "0"]
+
+
+def test_with_path():
+    "Test payloads are copied and not modified"
+
+    payload = {"a": {"b": [1, 2]}, "c": {"d": 1}}
+    result = with_path(payload, ["a", "b", "1"], "add", 3)
+    assert result == {"a": {"b": [1, 3, 2]}, "c": {"d": 1}}
+    assert payload == {"a": {"b": [1, 2]}, "c": {"d": 1}}
+    assert result["c"] is payload["c"]
+
+    assert with_path(payload, ["a", "b", "-"], "add", 3)["a"]["b"] == [1, 2, 3]
+    assert with_path(payload, ["a", "b", "0"], "remove")["a"]["b"] == [2]
+    assert with_path(payload, ["c", "e"], "set", 2)["c"] == {"d": 1, "e": 2}
+
+    with pytest.raises(PatchError):
+        with_path(payload, ["c", "e"], "replace", 2)
+    with pytest.raises(PatchError):
+        with_path(payload, ["a", "b", "2"], "remove")
+
+
+# Nodes testing
+# =====================================
+
+
+class Rule(NodeMap):
+    "Count rule builds"
+
+    builds = []
+
+    def node_hook_final(self):
+        self.builds.append(self.ident)
+
+
+class Rules(NodeList):
+    "Rules list"
+
+    conf_children = Rule
+
+
+class Strict(NodeMap):
+    "Validated node"
+
+    conf_schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {"port": {"type": "integer"}},
+    }
+
+
+class Service(NodeMap):
+    "Service config"
+
+    conf_children = [
+        {"key": "rules", "cls": Rules},
+        {"key": "strict", "cls": Strict},
+        {"key": "main_rule", "attr": "main", "cls": Rule, "hook": "hook_main"},
+    ]
+
+    def hook_main(self):
+        Rule.builds.append("hook_main")
+
+
+payload = {
+    "name": "service",
+    "rules": [{"name": "rule1"}, {"name": "rule2"}],
+    "strict": {"port": 80},
+    "main_rule": {"name": "main"},
+}
+
+
+def test_set_path():
+    "Ensure only the patched subtree is rebuilt"
+
+    node = Service(ident="Service", payload=payload)
+    rules = node.rules
+    rule1 = rules[0]
+
+    Rule.builds = []
+    node.set_path("rules.1.name", "changed")
+    assert Rule.builds == ["rules_1"]
+    assert node.rules is rules and rules[0] is rule1
+    assert rules[1].name == "changed"
+    assert node.get_value(lvl=-1)["rules"][1] == {"name": "changed"}
+    assert node.serialize(mode="raw")["rules"][1] == {"name": "changed"}
+    assert payload["rules"][1] == {"name": "rule2"}
+
+    # Item hooks are executed again
+    Rule.builds = []
+    node.set_path("main_rule.name", "new_main")
+    assert Rule.builds == ["main", "hook_main"]
+    assert node.main.name == "new_main"
+    assert node.get_value(lvl=-1)["main"] == {"name": "new_main"}
+
+
+def test_del_path():
+    "Test removals"
+
+    node = Service(ident="Service", payload=payload)
+    node.del_path("rules.0")
+    assert len(node.rules) == 1
+    assert node.rules[0].name == "rule2"
+
+    node.del_path("name")
+    assert "name" not in node.get_value()
+    with pytest.raises(PatchError):
+        node.del_path("missing")
+
+
+def test_apply_patch():
+    "Test JSON Patch operations"
+
+    node = Service(ident="Service", payload=payload)
+    node.apply_patch(
+        [
+            {"op": "test", "path": "/name", "value": "service"},
+            {"op": "add", "path": "/rules/-", "value": {"name": "rule3"}},
+            {"op": "replace", "path": "/strict/port", "value": 443},
+            {"op": "copy", "from": "/rules/0", "path": "/rules/0"},
+            {"op": "move", "from": "/name", "path": "/service_name"},
+        ]
+    )
+
+    result = node.get_value(lvl=-1)
+    assert [rule["name"] for rule in result["rules"]] == [
+        "rule1",
+        "rule1",
+        "rule2",
+        "rule3",
+    ]
+    assert result["strict"] == {"port": 443}
+    assert result["service_name"] == "service"
+    assert "name" not in result
+
+    with pytest.raises(PatchError):
+        node.apply_patch([{"op": "test", "path": "/service_name", "value": "x"}])
+    with pytest.raises(PatchError):
+        node.apply_patch([{"op": "unknown", "path": "/service_name"}])
+
+
+def test_patch_validation_error():
+    "Ensure failed patches leave the node unchanged"
+
+    node = Service(ident="Service", payload=payload)
+    strict = node.strict
+    with pytest.raises(SchemaError):
+        node.set_path("strict.port", "not_an_int")
+
+    assert node.strict is strict
+    assert strict.port == 80
+    assert node.get_value(lvl=-1)["strict"] == {"port": 80}
+
+
+def test_patch_validation_logs(caplog):
+    "Ensure schema errors log invalid payloads"
+
+    node = Service(ident="Service", payload=payload)
+    with pytest.raises(SchemaError):
+        node.set_path("strict.port", "not_an_int")
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[-2].endswith("Value: not_an_int")
+    assert messages[-1].endswith("Payload: {'port': 'not_an_int'}")
+
+
+class StrictService(Service):
+    "Service validating its children payloads"
+
+    conf_schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {
+            "main_rule": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}},
+            },
+        },
+    }
+
+
+def test_patch_ancestors_validation():
+    "Ensure ancestors validate patched payloads"
+
+    node = StrictService(ident="Service", payload=payload)
+    main = node.main
+    with pytest.raises(SchemaError):
+        node.set_path("main_rule.name", 42)
+
+    assert node.main is main
+    assert main.name == "main"
+    assert node.serialize(mode="raw")["main_rule"] == {"name": "main"}
+
+    # A failed full build raises the same error
+    with pytest.raises(SchemaError):
+        StrictService(ident="Service", payload=dict(payload, main_rule={"name": 42}))
+
+
+def test_apply_patch_atomic():
+    "Ensure failed patches restore previous operations"
+
+    node = Service(ident="Service", payload=payload)
+    with pytest.raises(PatchError):
+        node.apply_patch(
+            [
+                {"op": "add", "path": "/rules/-", "value": {"name": "rule3"}},
+                {"op": "replace", "path": "/strict/port", "value": 443},
+                {"op": "remove", "path": "/missing"},
+            ]
+        )
+
+    assert len(node.rules) == 2
+    assert node.strict.port == 80
+    assert node.get_value(lvl=-1)["rules"] == payload["rules"]
+    assert node.serialize(mode="raw") == payload
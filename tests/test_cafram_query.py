@@ -0,0 +1,139 @@
+import pytest
+
+from cafram.base import InvalidSyntax
+from cafram.nodes import NodeMap, NodeList
+from cafram.query import parse_query
+
+
+# Queries parsing
+# =====================================
+
+
+def test_parse_query():
+    "Test query steps"
+
+    assert parse_query("files.*.filters") == [
+        ("name", "files"),
+        ("name", "*"),
+        ("name", "filters"),
+    ]
+    assert parse_query("$..filters") == [("desc",), ("name", "filters")]
+    assert parse_query("**.filters") == [("desc",), ("name", "filters")]
+    assert parse_query("files[0][*]") == [
+        ("name", "files"),
+        ("index", 0),
+        ("index", "*"),
+    ]
+    assert parse_query("rules[?enabled=true][?name='a']") == [
+        ("name", "rules"),
+        ("filter", "enabled", True),
+        ("filter", "name", "a"),
+    ]
+    with pytest.raises(InvalidSyntax):
+        parse_query("files]")
+
+
+# Nodes queries
+# =====================================
+
+
+class Filter(NodeMap):
+    "Filter"
+
+
+class File(NodeMap):
+    "File"
+
+    conf_children = [{"key": "filters", "cls": Filter}]
+
+
+class Files(NodeList):
+    "Files list"
+
+    conf_children = File
+
+
+class Config(NodeMap):
+    "Config"
+
+    conf_children = [
+        {"key": "files", "cls": Files},
+        {"key": "backup", "cls": File},
+    ]
+
+
+class IndexedConfig(Config):
+    "Indexed config"
+
+    conf_index = True
+
+
+payload = {
+    "files": [
+        {"name": "a", "enabled": True, "filters": {"glob": "*.py"}},
+        {"name": "b", "enabled": False, "filters": {"glob": "*.md"}},
+        {"name": "c", "enabled": True, "filters": {"glob": "*.txt"}},
+    ],
+    "backup": {"name": "backup", "filters": {"glob": "*"}},
+}
+
+
+@pytest.mark.parametrize("cls", [Config, IndexedConfig])
+def test_query_nodes(cls):
+    "Test queries with and without index"
+
+    node = cls(ident="Config", payload=payload)
+    files = node.files
+
+    assert node.query_nodes("files.*.filters") == [f.filters for f in files]
+    assert node.query_nodes("files[1]") == [files[1]]
+    assert node.query_nodes("files[*]") == list(files)
+    assert node.query_nodes("files[?enabled=true]") == [files[0], files[2]]
+
+    filters = node.query_nodes("**.filters")
+    assert len(filters) == 4 and node.backup.filters in filters
+    assert node.query_nodes("$..filt*") == filters
+    assert node.files.query_nodes("**.filters") == [f.filters for f in files]
+
+    assert node.query_nodes(cls=File) == list(files) + [node.backup]
+    assert node.query_nodes(cls=File, where={"name": "b"}) == [files[1]]
+    assert len(node.query_nodes()) == 1 + 1 + 4 + 4
+
+
+def test_query_index_updates():
+    "Ensure rebuilt nodes are removed from index"
+
+    node = IndexedConfig(ident="Config", payload=payload)
+    index = node._node_index
+    assert len(index.get_class(Filter)) == 4
+
+    old = node.files[0].filters
+    node.set_path("files.0", {"name": "a", "filters": {"glob": "*.rst"}})
+    filters = node.query_nodes("**.filters")
+    assert old not in filters and node.files[0].filters in filters
+    assert len(index.get_class(Filter)) == 4
+
+    node.del_path("files.2")
+    assert len(node.query_nodes(cls=File)) == 3
+    assert len(node.query_nodes("**.filters")) == 3
+
+
+def test_query_index_mutations():
+    "Ensure indexed queries return walked results after children changes"
+
+    node = IndexedConfig(ident="Config", payload=payload)
+    old = node.backup
+    node.add_child("backup", File(ident="New", payload={"filters": {"glob": "*"}}))
+    node.add_child("extra", File(ident="Extra", payload={"filters": {}}))
+    node.files[0].filters = Filter(ident="Replaced", payload={"glob": "*.rst"})
+
+    index = node._node_index
+    for query in [{"path": "**.filters"}, {"cls": File}, {"cls": Filter}]:
+        indexed = node.query_nodes(**query)
+        node._node_index = None
+        walked = node.query_nodes(**query)
+        node._node_index = index
+        assert sorted(map(id, indexed)) == sorted(map(id, walked))
+
+    assert old not in node.query_nodes(cls=File)
+    assert old.filters not in index.get_class(Filter)
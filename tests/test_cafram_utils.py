@@ -1,9 +1,35 @@
 # import sys
 # import unittest
+import json
+import enum
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 import pytest
+import jsonschema
 
-from cafram.utils import get_logger, serialize, duplicates
+import cafram.utils
+from cafram.nodes import NodeMap
+from cafram.utils import (
+    get_logger,
+    serialize,
+    duplicates,
+    json_validate,
+    json_validate_defaults,
+    validator_cache_stats,
+    validator_cache_clear,
+    get_indent_logger,
+    get_cached_logger,
+    from_yaml,
+    to_yaml,
+    get_yaml,
+    to_json,
+    from_json,
+    to_dict,
+    read_yaml,
+    RWLock,
+)
 
 
 def test_get_logger():
@@ -38,6 +64,89 @@ def test_serialize_yaml(data_regression):
     data_regression.check(result)
 
 
+def test_serialize_yaml_objects():
+    "Ensure objects are serialized as JSON values, without JSON round trip"
+
+    payload = {
+        1: (True, 1.5),
+        "path": Path("/tmp"),
+        "tags": {"tag"},
+        "yes": "yes",
+        "empty": [],
+    }
+    result = serialize(payload, fmt="yaml")
+    assert result == (
+        "'1':\n- true\n- 1.5\npath: /tmp\ntags: \"{'tag'}\"\n"
+        "'yes': 'yes'\nempty: []\n"
+    )
+    assert from_yaml(result) == json.loads(serialize(payload))
+    assert serialize("value", fmt="yaml") == "value\n...\n"
+
+    # The YAML object can still be used after errors
+    payload = []
+    payload.append(payload)
+    with pytest.raises(ValueError):
+        serialize(payload, fmt="yaml")
+    assert to_yaml({"key": "value"}) == "key: value\n"
+
+
+json_payload = {
+    "name": "config",
+    "count": 3,
+    "ratio": 0.25,
+    "enabled": True,
+    "missing": None,
+    "items": [{"key": f"value_{idx}", "tags": []} for idx in range(3)],
+    "empty": {},
+    1: (1, 2),
+}
+
+
+class Color(enum.Enum):
+    "Enum serialized with str()"
+
+    RED = 1
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_json_fast(fast):
+    "Ensure JSON helpers return the same values in fast mode"
+
+    expected = json.dumps(json_payload, indent=2)
+    assert to_json(json_payload, fast=fast) == expected
+    assert serialize(json_payload, fast=fast) == expected
+    string = to_json(json_payload, nice=False, fast=fast)
+    assert from_json(string, fast=fast) == json.loads(expected)
+    assert to_dict(json_payload, fast=fast) == json.loads(expected)
+
+    # Fallbacks on differences
+    payload = {"name": "caf\u00e9", "big": 2**70}
+    assert to_json(payload, fast=fast) == json.dumps(payload, indent=2)
+    payload["path"] = Path("/tmp")
+    assert serialize(payload, fast=fast) == json.dumps(payload, indent=2, default=str)
+    for string in ["[NaN, 1e400]", '"\\ud800"']:
+        assert repr(from_json(string, fast=fast)) == repr(json.loads(string))
+    with pytest.raises(json.JSONDecodeError):
+        from_json("{", fast=fast)
+
+
+def test_json_exact():
+    "Ensure JSON helpers are the json module ones by default"
+
+    payload = {"a": 1e16, "b": float("nan"), "c": Color.RED, "d": [1]}
+    assert serialize(payload) == json.dumps(payload, indent=2, default=str)
+    del payload["c"]
+    assert to_json(payload) == json.dumps(payload, indent=2)
+    assert to_json(payload, nice=False) == '{"a": 1e+16, "b": NaN, "d": [1]}'
+    assert repr(to_dict(payload)) == repr(json.loads(json.dumps(payload)))
+
+    string = '{"n": 123456789012345678901234567890}'
+    assert from_json(string) == {"n": 123456789012345678901234567890}
+    node = NodeMap(ident="Node")
+    node.from_json(string)
+    assert node.n == 123456789012345678901234567890
+
+
 def test_duplicates(data_regression):
 
     payload = ["item1", "item2", "item3", "item1"]
@@ -45,5 +154,155 @@ def test_duplicates(data_regression):
     assert result == ["item1"]
 
 
+def test_get_indent_logger():
+    "Test indented logger adapters are shared per level"
+
+    log1 = get_indent_logger(3)
+    assert log1 is get_indent_logger(3)
+    assert log1 is not get_indent_logger(4)
+    assert log1.logger is get_cached_logger("cafram")
+    assert log1.process("msg", {}) == ("| | | msg", {})
+    assert log1.process("msg", {"indent": ""}) == ("msg", {})
+
+
+schema_example = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "key": {"type": "string", "default": "default_value"},
+    },
+}
+
+
+def test_validator_cache():
+    "Test validators are compiled once per schema"
+
+    validator_cache_clear()
+    for _ in range(5):
+        json_validate(schema_example, {"key": "value"})
+    stats = validator_cache_stats()
+    assert stats == {"hits": 4, "misses": 1, "size": 1}
+
+    result = json_validate_defaults(schema_example, {})
+    assert result == {"key": "default_value"}
+    assert validator_cache_stats()["size"] == 2
+
+    validator_cache_clear()
+    assert validator_cache_stats() == {"hits": 0, "misses": 0, "size": 0}
+
+
+def test_validator_cache_size(monkeypatch):
+    "Test least recently used validators are dropped"
+
+    monkeypatch.setattr(cafram.utils, "VALIDATOR_CACHE_SIZE", 2)
+    validator_cache_clear()
+    schemas = [dict(schema_example) for _ in range(3)]
+    for schema in schemas + schemas[1:] + [schemas[1]]:
+        json_validate(schema, {"key": "value"})
+    assert validator_cache_stats() == {"hits": 3, "misses": 3, "size": 2}
+
+    # The first schema was dropped, the second one is the most recent
+    json_validate(schemas[0], {"key": "value"})
+    json_validate(schemas[1], {"key": "value"})
+    assert validator_cache_stats() == {"hits": 4, "misses": 4, "size": 2}
+    validator_cache_clear()
+
+
+def test_validator_cache_errors():
+    "Test cached validators still raise validation errors"
+
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        json_validate(schema_example, {"key": 1234})
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        json_validate(schema_example, {"key": 1234})
+
+
+def test_yaml_threads():
+    "Ensure YAML helpers can be used from many threads"
+
+    def worker(idx):
+        payload = {"worker": idx, "items": [{"key": f"value_{n}"} for n in range(20)]}
+        for _ in range(5):
+            assert from_yaml(to_yaml(payload)) == payload
+            assert from_yaml(serialize(payload, fmt="yaml")) == payload
+        return get_yaml()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(worker, range(16)))
+
+    assert get_yaml() is get_yaml()
+    assert get_yaml() not in instances
+
+
+def test_rwlock():
+    "Test readers-writer lock reentrancy"
+
+    lock = RWLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+    with lock.read():
+        with lock.read():
+            with pytest.raises(RuntimeError):
+                lock.acquire_write()
+
+    # Readers wait for writers
+    events = []
+    lock.acquire_write()
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append(1)))
+    reader.start()
+    reader.join(0.1)
+    assert not events
+    lock.release_write()
+    reader.join()
+    assert events == [1]
+
+
+yaml_document = """
+name: config
+enabled: yes
+mode: 0644
+date: 2020-01-01
+base: &base {port: 80}
+server:
+  <<: *base
+  host: example.com
+name: duplicated
+"""
+
+
+@pytest.mark.parametrize("c_extension", [True, False])
+def test_yaml_fast(c_extension, monkeypatch, tmp_path):
+    "Ensure fast YAML mode returns round trip mode values"
+
+    if not c_extension:
+        monkeypatch.setattr(cafram.utils, "CEmitter", None)
+    monkeypatch.setattr(cafram.utils, "_yaml_local", threading.local())
+
+    expected = from_yaml(yaml_document)
+    result = from_yaml(yaml_document, fast=True)
+    assert type(result) is dict and result == expected
+    assert result["enabled"] is True and result["mode"] == 420
+    assert result["server"] == {"port": 80, "host": "example.com"}
+
+    # YAML 1.1 strings are quoted
+    payload = {"name": "config", "values": ["yes", "on", "010", "1:20"], "none": {}}
+    output = to_yaml(payload, fast=True)
+    assert output == to_yaml(payload)
+    assert from_yaml(output) == from_yaml(output, fast=True) == payload
+    assert from_yaml(to_yaml(expected, fast=True), fast=True) == expected
+    assert to_yaml(payload, headers=True, fast=True).startswith("%YAML 1.1\n---\n")
+
+    path = tmp_path / "config.yml"
+    path.write_text(yaml_document, encoding="utf-8")
+    assert read_yaml(path, fast=True) == read_yaml(path) == expected
+
+    # Duplicate keys of mappings with merge keys differ
+    document = "base: &base {port: 80}\nserver:\n  <<: *base\n  port: 1\n  port: 2\n"
+    assert from_yaml(document)["server"] == {"port": 1}
+    assert from_yaml(document, fast=True)["server"] == {"port": 2}
+
+
 if __name__ == "__main__":
     retcode = pytest.main([__file__])
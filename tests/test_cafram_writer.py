@@ -0,0 +1,138 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from cafram.base import InvalidSyntax
+from cafram.nodes import NodeMap, NodeList
+from cafram.utils import to_yaml
+from cafram.writer import write_json, write_yaml
+
+
+# Nodes definitions
+# =====================================
+
+
+class Filter(NodeMap):
+    "Filter"
+
+
+class File(NodeMap):
+    "File"
+
+    conf_children = [{"key": "filters", "cls": Filter}]
+
+
+class Files(NodeList):
+    "Files list"
+
+    conf_children = File
+
+
+class LazyFiles(Files):
+    "Lazy files list"
+
+    conf_lazy = True
+    conf_lazy_cache = 2
+
+
+class Config(NodeMap):
+    "Config"
+
+    conf_children = [
+        {"key": "files", "cls": Files},
+        {"key": "backup", "cls": File},
+    ]
+
+
+class LazyConfig(Config):
+    "Lazy config"
+
+    conf_lazy = True
+    conf_children = [
+        {"key": "files", "cls": LazyFiles},
+        {"key": "backup", "cls": File},
+    ]
+
+
+payload = {
+    "name": "config",
+    "files": [
+        {"name": f"file_{idx}", "size": idx * 1.5, "filters": {"glob": f"*.{idx}"}}
+        for idx in range(5)
+    ],
+    "backup": {"name": "backup", "enabled": None, "filters": {}},
+    "tags": [],
+    "options": {"yes": "yes", "null": "null", "number": "1", "empty": ""},
+}
+
+
+def write(func, value, **kwargs):
+    "Return written output"
+    stream = io.StringIO()
+    func(value, stream, **kwargs)
+    return stream.getvalue()
+
+
+# Writers testing
+# =====================================
+
+
+@pytest.mark.parametrize("cls", [Config, LazyConfig])
+def test_write_json(cls):
+    "Ensure written JSON is the same than dumped values"
+
+    node = cls(ident="Config", payload=payload)
+    value = node.get_value(lvl=-1)
+    assert write(write_json, node) == json.dumps(value, indent=2)
+    assert write(write_json, node, indent=None) == json.dumps(value)
+    assert write(write_json, value) == json.dumps(value, indent=2)
+
+
+@pytest.mark.parametrize("cls", [Config, LazyConfig])
+def test_write_yaml(cls):
+    "Ensure written YAML is the same than dumped values"
+
+    node = cls(ident="Config", payload=payload)
+    value = node.get_value(lvl=-1)
+    assert write(write_yaml, node) == to_yaml(value)
+    assert write(write_yaml, node, headers=True) == to_yaml(value, headers=True)
+    assert write(write_yaml, value) == to_yaml(value)
+
+
+def test_write_objects():
+    "Ensure unknown objects are written as strings"
+
+    value = {"path": Path("/tmp"), 1: (True, 2.5)}
+    assert json.loads(write(write_json, value)) == {
+        "path": "/tmp",
+        "1": [True, 2.5],
+    }
+    assert write(write_yaml, value) == "path: /tmp\n1:\n- true\n- 2.5\n"
+
+
+def test_write_stream():
+    "Test nodes writer and deep trees"
+
+    payload = {"leaf": "value"}
+    for idx in range(10000):
+        payload = {"child": payload, "items": [[idx]]}
+    node = NodeMap(ident="Deep", payload=payload, autoconf=-1)
+
+    # Trees deeper than the recursion limit are written
+    stream = io.StringIO()
+    write_json(node, stream, indent=None)
+    output = stream.getvalue()
+    assert output.startswith('{"child": {"child": {')
+    assert output.endswith('"items": [[9998]]}, "items": [[9999]]}')
+    assert output.count('{"leaf": "value"}') == 1
+
+    for _ in range(9998):
+        node = node.child
+    stream = io.StringIO()
+    node.write_stream(stream, fmt="yaml")
+    assert stream.getvalue() == to_yaml(node.get_value(lvl=-1))
+
+    with pytest.raises(InvalidSyntax):
+        node.write_stream(stream, fmt="toml")